@@ -1,17 +1,9 @@
-from django.views.generic import TemplateView
+from core.prerender import PrerenderedTemplateView
 
 
-class AboutAuthorView(TemplateView):
+class AboutAuthorView(PrerenderedTemplateView):
     template_name = "about/author.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        return context
 
-
-class AboutTechView(TemplateView):
+class AboutTechView(PrerenderedTemplateView):
     template_name = "about/tech.html"
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        return context
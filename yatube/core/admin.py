@@ -0,0 +1,58 @@
+"""Общие настройки админки для больших таблиц."""
+from functools import partial
+
+from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.db import models
+from django.urls import NoReverseMatch, reverse
+
+from core.paginator import EstimatedCountPaginator
+
+
+class ListRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id связанной записи для list_editable.
+
+    Ссылка на связанную запись строится по id, без запроса к базе
+    на каждую строку списка, как у ForeignKeyRawIdWidget.
+    """
+
+    def label_and_url_for_value(self, value):
+        opts = self.rel.model._meta
+        try:
+            url = reverse(
+                f"{self.admin_site.name}:"
+                f"{opts.app_label}_{opts.model_name}_change",
+                args=(value,),
+            )
+        except NoReverseMatch:
+            url = ""
+        return f"#{value}", url
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Админка для таблиц с сотнями тысяч записей.
+
+    Внешние ключи в list_editable выводятся полем id (ListRawIdWidget)
+    вместо <select> со всеми записями связанной таблицы; в форме
+    записи для них стоит задавать autocomplete_fields. Число записей
+    в списке оценивается (EstimatedCountPaginator), а общее число
+    записей без фильтров не считается.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault(
+            "formfield_callback",
+            partial(self.changelist_formfield_for_dbfield, request=request),
+        )
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_formfield_for_dbfield(self, db_field, request, **kwargs):
+        if isinstance(db_field, models.ForeignKey):
+            kwargs["widget"] = ListRawIdWidget(
+                db_field.remote_field, self.admin_site
+            )
+            return db_field.formfield(**kwargs)
+        return self.formfield_for_dbfield(db_field, request, **kwargs)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        # Регистрируем обработчики outbox и проверки.
+        from . import checks, mail  # noqa: F401
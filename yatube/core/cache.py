@@ -0,0 +1,59 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache
+
+from core.metrics import cache_requests
+
+# Префикс ключей кэша sorl-thumbnail (THUMBNAIL_KEY_PREFIX).
+THUMBNAIL_PREFIX = "sorl-thumbnail"
+
+
+def key_namespace(key):
+    """Пространство ключа для метрик: имя фрагмента шаблона,
+    thumbnail для sorl-thumbnail или префикс ключа до двоеточия."""
+    if key.startswith("template.cache."):
+        return key.split(".")[2]
+    if key.startswith(THUMBNAIL_PREFIX):
+        return "thumbnail"
+    return key.split(":", 1)[0]
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи кэша в метриках.
+
+    get_many базового класса вызывает get для каждого ключа,
+    поэтому отдельно не учитывается.
+    """
+
+    missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self.missing, version)
+        found = value is not self.missing
+        cache_requests.inc(
+            namespace=key_namespace(key), result="hit" if found else "miss"
+        )
+        return value if found else default
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedMemcachedCache(InstrumentedCacheMixin, MemcachedCache):
+    """Общий для всех процессов кэш; get_many memcached не вызывает
+    get, поэтому учитывается отдельно."""
+
+    def get_many(self, keys, version=None):
+        found = super().get_many(keys, version)
+        for key in keys:
+            cache_requests.inc(
+                namespace=key_namespace(key),
+                result="hit" if key in found else "miss",
+            )
+        return found
+
+
+def is_process_local(alias):
+    """Кэш alias живет в памяти процесса и не виден другим воркерам."""
+    return isinstance(caches[alias], LocMemCache)
@@ -0,0 +1,35 @@
+"""Проверки общего кэша для лимитов частоты запросов (core.ratelimit).
+
+С кэшем в памяти процесса каждый воркер считает свою корзину, и N
+воркеров пропускают в N раз больше запросов, чем задано в RATELIMITS.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from core.cache import is_process_local
+
+
+@register(Tags.caches)
+def check_ratelimit_cache(app_configs, **kwargs):
+    if settings.RATELIMIT_CACHE and is_process_local(
+        settings.RATELIMIT_CACHE
+    ):
+        return [
+            Error(
+                "RATELIMIT_CACHE указывает на кэш памяти процесса.",
+                hint="Укажите общий кэш или RATELIMIT_CACHE = None.",
+                id="core.E001",
+            )
+        ]
+    if settings.RATELIMITS and not settings.RATELIMIT_CACHE:
+        if settings.DEBUG:
+            return []
+        return [
+            Warning(
+                "Лимиты частоты запросов не применяются: "
+                "не задан RATELIMIT_CACHE.",
+                hint="Укажите общий кэш (YATUBE_MEMCACHED).",
+                id="core.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,156 @@
+"""Сжатие ответов brotli или gzip, в том числе потоковых.
+
+Сжимаются только текстовые форматы (HTML, JSON, CSV, JS, SVG…):
+картинки, архивы и уже сжатые ответы (с Content-Encoding) проходят
+как есть, короткие ответы — тоже. Потоковые ответы сжимаются по мере
+отдачи: каждая часть сбрасывается в выход, и клиент получает данные
+сразу, а не после конца выгрузки.
+
+BREACH: от подбора CSRF-токена по длине сжатого ответа защищает
+Django, который маскирует токен заново при каждом рендеринге. Страница
+с токеном дополнительно сжимается только gzip, а в заголовок gzip
+добавляется имя файла случайной длины (до COMPRESSION_BREACH_PADDING
+байтов). Это лишь шум: усреднение по многим запросам его убирает,
+поэтому другие секреты, выводимые рядом с отраженным вводом, сжатие
+не защищает.
+"""
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core.staticfiles import accepted_encodings, brotli
+
+COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+)
+
+GZIP_LEVEL = 6
+
+BROTLI_QUALITY = 4
+
+# Флаг FNAME заголовка gzip: после заголовка идет имя файла до нуля.
+GZIP_FNAME = 8
+
+
+def compressible(content_type):
+    media_type = content_type.split(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class GzipCompressor:
+    """Потоковый gzip; padding — длина случайного имени в заголовке."""
+
+    def __init__(self, padding=0):
+        self.deflate = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        self.crc = 0
+        self.size = 0
+        flags = GZIP_FNAME if padding else 0
+        self.header = b"\x1f\x8b\x08" + bytes([flags]) + b"\0\0\0\0\0\xff"
+        if padding:
+            self.header += b"a" * padding + b"\0"
+
+    def compress(self, data, flush=False):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        output = self.header + self.deflate.compress(data)
+        self.header = b""
+        if flush:
+            output += self.deflate.flush(zlib.Z_SYNC_FLUSH)
+        return output
+
+    def finish(self):
+        return (
+            self.header
+            + self.deflate.flush()
+            + struct.pack("<LL", self.crc, self.size & 0xFFFFFFFF)
+        )
+
+
+class BrotliCompressor:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data, flush=False):
+        output = self.compressor.process(data)
+        if flush:
+            output += self.compressor.flush()
+        return output
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def choose_encoding(request, breach_sensitive):
+    accepted = accepted_encodings(request)
+    if "br" in accepted and brotli is not None and not breach_sensitive:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def make_compressor(encoding, breach_sensitive):
+    if encoding == "br":
+        return BrotliCompressor()
+    padding = 0
+    if breach_sensitive:
+        padding = 1 + secrets.randbelow(settings.COMPRESSION_BREACH_PADDING)
+    return GzipCompressor(padding)
+
+
+def compress_stream(compressor, chunks):
+    for chunk in chunks:
+        data = compressor.compress(chunk, flush=True)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_response(request, response):
+    """Сжимает ответ, если клиент и тип содержимого это допускают."""
+    if response.has_header("Content-Encoding") or not compressible(
+        response.get("Content-Type", "")
+    ):
+        return response
+    if not response.streaming and (
+        len(response.content) < settings.COMPRESSION_MIN_SIZE
+    ):
+        return response
+    patch_vary_headers(response, ("Accept-Encoding",))
+    breach_sensitive = bool(request.META.get("CSRF_COOKIE_USED"))
+    encoding = choose_encoding(request, breach_sensitive)
+    if encoding is None:
+        return response
+
+    compressor = make_compressor(encoding, breach_sensitive)
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            compressor, response.streaming_content
+        )
+        del response["Content-Length"]
+    else:
+        content = compressor.compress(response.content) + compressor.finish()
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        # Сжатое представление побайтно отличается от исходного.
+        response["ETag"] = "W/" + etag
+    response["Content-Encoding"] = encoding
+    return response
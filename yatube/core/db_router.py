@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Max
+
+# Состояние текущего запроса: можно ли читать с реплик
+# и была ли в запросе запись в основную базу.
+_state = threading.local()
+
+# Кэш состояния реплик: alias -> (время проверки, исправна, отставание).
+_replica_status = {}
+_status_lock = threading.Lock()
+
+
+def use_replicas(enabled):
+    """Разрешает или запрещает чтение с реплик в текущем потоке."""
+    _state.use_replicas = enabled
+    _state.wrote = False
+
+
+def reset_state():
+    _state.use_replicas = False
+    _state.wrote = False
+
+
+def wrote_to_primary():
+    """Была ли в текущем запросе запись в основную базу."""
+    return getattr(_state, "wrote", False)
+
+
+def get_replicas():
+    """Список алиасов реплик из настроек с их весами."""
+    replicas = getattr(settings, "DATABASE_REPLICAS", {})
+    return {
+        alias: options
+        for alias, options in replicas.items()
+        if alias in settings.DATABASES
+    }
+
+
+def measure_lag(alias):
+    """Отставание реплики в секундах.
+
+    Сравнивает дату самой свежей записи модели REPLICA_LAG_MODEL
+    (наследника CreatedModel) в основной базе и на реплике.
+    """
+    model = apps.get_model(settings.REPLICA_LAG_MODEL)
+    primary = model._base_manager.using(DEFAULT_DB_ALIAS).aggregate(
+        last=Max("created")
+    )["last"]
+    replica = model._base_manager.using(alias).aggregate(
+        last=Max("created")
+    )["last"]
+    if primary is None:
+        return 0.0
+    if replica is None:
+        return float("inf")
+    return max((primary - replica).total_seconds(), 0.0)
+
+
+def replica_status(alias):
+    """Возвращает (исправна, отставание) с кэшированием на
+    REPLICA_CHECK_INTERVAL секунд."""
+    now = time.monotonic()
+    checked = _replica_status.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_CHECK_INTERVAL:
+        return checked[1], checked[2]
+
+    with _status_lock:
+        try:
+            connections[alias].ensure_connection()
+            lag = measure_lag(alias)
+            healthy = True
+        except DatabaseError:
+            lag = float("inf")
+            healthy = False
+        _replica_status[alias] = (now, healthy, lag)
+    return healthy, lag
+
+
+def choose_replica():
+    """Выбирает исправную реплику с допустимым отставанием.
+
+    Из подходящих реплик выбирается случайная с учетом веса;
+    если подходящих нет, чтение идет из основной базы.
+    """
+    candidates = []
+    weights = []
+    for alias, options in get_replicas().items():
+        healthy, lag = replica_status(alias)
+        max_lag = options.get("max_lag", settings.REPLICA_MAX_LAG)
+        if healthy and lag <= max_lag:
+            candidates.append(alias)
+            weights.append(options.get("weight", 1))
+    if not candidates:
+        return DEFAULT_DB_ALIAS
+    return random.choices(candidates, weights=weights)[0]
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплики, а запись — в основную базу.
+
+    Реплики используются только внутри запросов, для которых
+    ReplicaPinningMiddleware разрешила чтение с реплик, и только до
+    первой записи: после нее запрос читает свои же данные из основной
+    базы, а не с отстающей реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if not getattr(_state, "use_replicas", False) or wrote_to_primary():
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
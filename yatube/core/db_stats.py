@@ -0,0 +1,63 @@
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Строковые и числовые литералы, списки параметров и пробелы,
+# которые убираются при нормализации SQL.
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PARAMS_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Приводит запрос к шаблону: литералы и параметры заменяются на ?,
+    списки IN (...) схлопываются."""
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = PARAMS_LIST.sub("(...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """Считает число, суммарное время и самые медленные SQL-запросы.
+
+    Подключается к курсорам через connection.execute_wrapper, поэтому
+    работает и при DEBUG=False.
+    """
+
+    def __init__(self, slow_threshold=None):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, "")
+        self.slow_threshold = slow_threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed > self.slowest[0]:
+                self.slowest = (elapsed, sql)
+            if (
+                self.slow_threshold is not None
+                and elapsed >= self.slow_threshold
+            ):
+                self.slow.append((elapsed, sql))
+
+
+@contextmanager
+def collect_query_stats(slow_threshold=None):
+    """Собирает QueryStats по всем базам внутри блока."""
+    stats = QueryStats(slow_threshold)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
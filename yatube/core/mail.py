@@ -0,0 +1,138 @@
+"""Очередь исходящей почты поверх transactional outbox.
+
+QueuedEmailBackend (EMAIL_BACKEND) не отправляет письма, а сохраняет их
+событиями темы mail.send, поэтому PasswordResetView отвечает сразу.
+Одинаковые письма (тот же отправитель, получатели и текст) в пределах
+MAIL_DEDUP_SECONDS ставятся в очередь один раз: повторные запросы
+сброса пароля не превращаются в поток писем.
+
+process_outbox отдает обработчику пачку писем, и все они уходят
+через одно соединение QUEUED_EMAIL_BACKEND. Если соединение не
+открылось, пачка повторяется по правилам outbox; письмо, которое
+не удалось отправить, ставится в очередь заново с экспоненциальной
+задержкой, но не больше MAIL_MAX_ATTEMPTS раз.
+"""
+import base64
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from core import metrics, outbox
+
+MAIL_TOPIC = "mail.send"
+
+logger = logging.getLogger("core.mail")
+
+mail_messages = metrics.registry.counter(
+    "yatube_mail_messages_total",
+    "Письма очереди по результату.",
+    ("result",),
+)
+
+
+def message_to_data(message):
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError("Вложения MIMEBase не поддерживаются очередью")
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            [filename, base64.b64encode(content).decode(), mimetype]
+        )
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": message.to,
+        "cc": message.cc,
+        "bcc": message.bcc,
+        "reply_to": message.reply_to,
+        "headers": message.extra_headers,
+        "alternatives": getattr(message, "alternatives", []),
+        "attachments": attachments,
+    }
+
+
+def message_from_data(data):
+    message = EmailMultiAlternatives(
+        subject=data["subject"],
+        body=data["body"],
+        from_email=data["from_email"],
+        to=data["to"],
+        cc=data["cc"],
+        bcc=data["bcc"],
+        reply_to=data["reply_to"],
+        headers=data["headers"],
+        alternatives=[tuple(item) for item in data["alternatives"]],
+    )
+    for filename, content, mimetype in data["attachments"]:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+def dedup_key(data, now=None):
+    """Ключ outbox: одинаковые письма в одном окне совпадают."""
+    now = time.time() if now is None else now
+    digest = hashlib.sha256(
+        json.dumps(data, sort_keys=True).encode()
+    ).hexdigest()
+    return f"mail:{digest}:{int(now // settings.MAIL_DEDUP_SECONDS)}"
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Сохраняет письма в outbox вместо отправки."""
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            data = message_to_data(message)
+            outbox.enqueue(
+                MAIL_TOPIC, {"message": data}, key=dedup_key(data)
+            )
+        mail_messages.inc(len(email_messages), result="queued")
+        return len(email_messages)
+
+
+@outbox.handler(MAIL_TOPIC)
+def send_queued_mail(events):
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+    # Ошибка открытия соединения повторяет всю пачку.
+    connection.open()
+    try:
+        for event in events:
+            data = event.data
+            message = message_from_data(data["message"])
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                retry_message(data, error)
+                # Следующее письмо откроет соединение заново.
+                connection.close()
+            else:
+                mail_messages.inc(result="sent")
+    finally:
+        connection.close()
+
+
+def retry_message(data, error):
+    attempt = data.get("attempt", 0) + 1
+    recipients = ", ".join(data["message"]["to"])
+    if attempt >= settings.MAIL_MAX_ATTEMPTS:
+        logger.error("Письмо для %s не отправлено: %r", recipients, error)
+        mail_messages.inc(result="failed")
+        return
+    logger.warning(
+        "Письмо для %s отложено (попытка %d): %r", recipients, attempt, error
+    )
+    mail_messages.inc(result="retry")
+    outbox.enqueue(
+        MAIL_TOPIC,
+        dict(data, attempt=attempt),
+        delay=outbox.retry_delay(attempt),
+    )
@@ -0,0 +1,97 @@
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import (ManifestFilesMixin,
+                                                staticfiles_storage)
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+from core.warmup import template_names
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+(['"])(?P<name>[^'"]+)\1""")
+ATTRIBUTE = re.compile(r"""\b(?:href|src)\s*=\s*(['"])(?P<value>[^'"]*)\1""")
+# Ссылки, которые не относятся к статике.
+EXTERNAL = ("{", "#", "?", "http:", "https:", "//", "mailto:", "data:")
+
+
+def template_files():
+    """Пары (имя шаблона, путь к файлу) для всех движков Django."""
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in template_names(engine):
+            for loader in engine.engine.template_loaders:
+                origins = loader.get_template_sources(
+                    name.replace(os.sep, "/")
+                )
+                origin = next(
+                    (o for o in origins if os.path.exists(o.name)), None
+                )
+                if origin is not None:
+                    yield name, origin.name
+                    break
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет ссылки шаблонов на статику: каждый {% static %} "
+        "должен найтись, а файлы статики — подключаться через {% static %}."
+    )
+
+    def handle(self, *args, **options):
+        storage = staticfiles_storage
+        self.manifest = (
+            storage.hashed_files
+            if isinstance(storage, ManifestFilesMixin)
+            else None
+        )
+        problems = []
+        checked = 0
+        for name, path in template_files():
+            with open(path, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+            for number, line in enumerate(lines, 1):
+                count, found = self.check_line(line)
+                checked += count
+                problems += [f"{name}:{number}: {text}" for text in found]
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"Проблем со статикой: {len(problems)}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Ссылок на статику проверено: {checked}")
+        )
+
+    def check_line(self, line):
+        """Число найденных в строке ссылок и описания проблем."""
+        checked, problems = 0, []
+        for match in STATIC_TAG.finditer(line):
+            checked += 1
+            static = match.group("name")
+            if not finders.find(static):
+                problems.append(f"нет файла {static}")
+            elif "stylesheet" in line and not static.endswith(".css"):
+                problems.append(f"{static} подключен как стили")
+            elif self.manifest and (
+                staticfiles_storage.clean_name(static) not in self.manifest
+            ):
+                problems.append(
+                    f"{static} нет в staticfiles.json, запустите collectstatic"
+                )
+        for match in ATTRIBUTE.finditer(line):
+            value = match.group("value").split("?")[0]
+            if not value or value.startswith(EXTERNAL):
+                continue
+            checked += 1
+            static = value
+            if value.startswith(settings.STATIC_URL):
+                static = value[len(settings.STATIC_URL):]
+            elif value.startswith("/"):
+                continue
+            if finders.find(static.lstrip("./")):
+                problems.append(f"{value} подключен без {{% static %}}")
+        return checked, problems
@@ -0,0 +1,59 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Обрабатывает события transactional outbox: пачками, "
+        "с повторами при ошибках."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать готовые события и завершиться.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда событий нет.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            help="База с событиями; по умолчанию основная и шарды постов.",
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            default=7,
+            help="Удалять события, обработанные больше N дней назад.",
+        )
+
+    def handle(self, *args, **options):
+        databases = options["database"] or outbox.outbox_databases()
+        older_than = timezone.now() - timedelta(days=options["purge_days"])
+        purged = sum(
+            outbox.purge_processed(older_than, alias) for alias in databases
+        )
+        self.stdout.write(f"Удалено обработанных событий: {purged}")
+
+        while True:
+            total = sum(
+                outbox.process_pending(alias, options["batch_size"])
+                for alias in databases
+            )
+            if total:
+                self.stdout.write(f"Обработано событий: {total}")
+            if options["once"]:
+                break
+            if not total:
+                time.sleep(options["interval"])
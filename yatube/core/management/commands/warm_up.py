@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import is_process_local
+from core.warmup import prime_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогревает общий кэш: рендерит первые страницы главной и горячих "
+        "групп, заполняя кэш фрагментов (он живет 20 секунд, поэтому "
+        "команду запускают перед переключением трафика) и миниатюр. "
+        "Работает только с общим кэшем (YATUBE_MEMCACHED); шаблоны "
+        "и маршруты каждого воркера прогревает wsgi.py при YATUBE_WARMUP=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--groups",
+            type=int,
+            help="Сколько самых активных групп отрендерить.",
+        )
+
+    def handle(self, *args, **options):
+        if is_process_local(DEFAULT_CACHE_ALIAS):
+            raise CommandError(
+                "Кэш живет в памяти процесса, и прогрев командой не виден "
+                "воркерам: настройте общий кэш (YATUBE_MEMCACHED) или "
+                "прогревайте воркеры при запуске (YATUBE_WARMUP=1)."
+            )
+        started = time.monotonic()
+        pages = prime_pages(options["groups"])
+        self.stdout.write(f"Страниц: {len(pages)}")
+        for path in pages:
+            self.stdout.write(f"  {path}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово за {time.monotonic() - started:.2f} с")
+        )
@@ -0,0 +1,232 @@
+"""Метрики процесса в формате экспозиции Prometheus.
+
+Счетчики и гистограммы хранятся в памяти процесса. Чтобы собрать
+метрики всех воркеров, каждый процесс периодически сохраняет снимок
+в METRICS_DIR, а эндпоинт /metrics/ складывает снимки всех процессов.
+Gauge вычисляется функцией в момент чтения метрик.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+SNAPSHOT_NAME = re.compile(r"metrics_(\d+)\.json")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def escape(value):
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace('"', r"\"")
+        .replace("\n", r"\n")
+    )
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(
+        f'{name}="{escape(value)}"' for name, value in pairs
+    )
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def expose(self, samples):
+        for key, value in sorted(samples.items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            # Счетчики по корзинам, затем сумма и количество.
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [list(key), list(value)] for key, value in self.values.items()
+            ]
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [left + right for left, right in zip(total, value)]
+
+    def expose(self, samples):
+        for key, state in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = format_labels(self.labels, key, [("le", bound)])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labels, key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {state[-1]}"
+            labels = format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {state[-2]}"
+            yield f"{self.name}_count{labels} {state[-1]}"
+
+
+class Gauge:
+    """Значение, которое вычисляется функцией при чтении метрик."""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def expose(self):
+        yield f"{self.name} {self.function()}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=None):
+        return self.register(
+            Histogram(name, documentation, labels, buckets)
+        )
+
+    def gauge(self, name, documentation, function):
+        return self.register(Gauge(name, documentation, function))
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot()
+            for name, metric in self.metrics.items()
+            if not isinstance(metric, Gauge)
+        }
+
+    def flush(self, force=False):
+        """Сохраняет снимок метрик процесса в METRICS_DIR не чаще
+        раза в METRICS_FLUSH_INTERVAL секунд."""
+        directory = settings.METRICS_DIR
+        interval = settings.METRICS_FLUSH_INTERVAL
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < interval):
+            return
+        self.last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """Снимки всех процессов: из METRICS_DIR и текущего процесса."""
+        snapshots = {os.getpid(): self.snapshot()}
+        directory = settings.METRICS_DIR
+        if directory and os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                match = SNAPSHOT_NAME.fullmatch(filename)
+                if match is None or int(match.group(1)) in snapshots:
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as file:
+                        snapshots[int(match.group(1))] = json.load(file)
+                except (OSError, ValueError):
+                    # Чужой или поврежденный файл не ломает /metrics/.
+                    continue
+        return snapshots.values()
+
+    def expose(self):
+        """Метрики всех процессов в текстовом формате Prometheus."""
+        merged = {}
+        for snapshot in self.collect():
+            for name, samples in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                totals = merged.setdefault(name, {})
+                for key, value in samples:
+                    key = tuple(key)
+                    totals[key] = metric.merge(totals.get(key), value)
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            if isinstance(metric, Gauge):
+                lines.extend(metric.expose())
+            else:
+                lines.extend(metric.expose(merged.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+view_latency = registry.histogram(
+    "yatube_view_latency_seconds", "Время ответа view.", ("view",)
+)
+responses = registry.counter(
+    "yatube_responses_total", "Ответы по view и коду.", ("view", "status")
+)
+db_queries = registry.histogram(
+    "yatube_db_queries_per_request",
+    "Число SQL-запросов на запрос к сайту.",
+    ("view",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+cache_requests = registry.counter(
+    "yatube_cache_requests_total",
+    "Обращения к кэшу по пространству ключей.",
+    ("namespace", "result"),
+)
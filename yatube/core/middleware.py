@@ -0,0 +1,245 @@
+import logging
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from core import (compression, db_router, metrics, ratelimit, staticfiles,
+                  template_profiler)
+from core.db_stats import collect_query_stats, normalize_sql
+from users.auth import get_cached_user
+
+slow_sql_logger = logging.getLogger("core.slow_sql")
+profiler_logger = logging.getLogger("core.template_profiler")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinningMiddleware:
+    """Разрешает чтение с реплик для безопасных запросов.
+
+    После записи в основную базу пользователь на REPLICA_PIN_SECONDS
+    секунд закрепляется за основной базой (через cookie), чтобы сразу
+    видеть свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE_NAME
+        pinned_until = request.COOKIES.get(cookie, "")
+        try:
+            pinned = float(pinned_until) > time.time()
+        except ValueError:
+            pinned = False
+
+        db_router.use_replicas(
+            request.method in SAFE_METHODS
+            and not pinned
+            and bool(db_router.get_replicas())
+        )
+        try:
+            response = self.get_response(request)
+            if db_router.wrote_to_primary():
+                window = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    cookie,
+                    str(time.time() + window),
+                    max_age=window,
+                    httponly=True,
+                    samesite="Lax",
+                )
+        finally:
+            db_router.reset_state()
+        return response
+
+
+class QueryTimingMiddleware:
+    """Замеряет SQL-запросы каждого запроса к сайту.
+
+    Отдает число запросов, время в базе и общее время ответа
+    в заголовке Server-Timing и пишет в лог core.slow_sql выборку
+    медленных запросов с именем view и нормализованным SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        started = time.perf_counter()
+        with collect_query_stats(threshold) as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        request.query_stats = stats
+
+        response["Server-Timing"] = ", ".join(
+            (
+                f'db;dur={stats.duration * 1000:.1f};'
+                f'desc="{stats.count} queries"',
+                f"db-slowest;dur={stats.slowest[0] * 1000:.1f}",
+                f"app;dur={(total - stats.duration) * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            )
+        )
+        if stats.slow and random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+            self.log_slow_queries(request, stats)
+        return response
+
+    def log_slow_queries(self, request, stats):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        for elapsed, sql in stats.slow:
+            slow_sql_logger.warning(
+                "%.1f ms %s %s",
+                elapsed * 1000,
+                view_name,
+                normalize_sql(sql),
+            )
+
+
+class MetricsMiddleware:
+    """Записывает время ответа, код ответа и число SQL-запросов
+    по каждому view в реестр метрик.
+
+    Должна стоять перед QueryTimingMiddleware, чтобы получить
+    собранную ею статистику запросов к базе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        metrics.view_latency.observe(elapsed, view=view)
+        metrics.responses.inc(view=view, status=response.status_code)
+        stats = getattr(request, "query_stats", None)
+        if stats is not None:
+            metrics.db_queries.observe(stats.count, view=view)
+        metrics.registry.flush()
+        return response
+
+
+class TemplateProfilerMiddleware:
+    """Профилирует рендеринг шаблонов при TEMPLATE_PROFILING = True.
+
+    Рейтинг самых дорогих шаблонов, include, блоков, тегов и фильтров
+    пишется в лог core.template_profiler; если задан
+    TEMPLATE_PROFILER_DIR, туда же сохраняются отчет и стеки
+    для flamegraph.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        template_profiler.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with template_profiler.profile() as profile:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        report = profile.report(settings.TEMPLATE_PROFILER_TOP)
+        profiler_logger.info("%s %s\n%s", view, request.path, report)
+
+        directory = settings.TEMPLATE_PROFILER_DIR
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            name = f"{time.time():.6f}_{view.replace(':', '_')}"
+            path = os.path.join(directory, name)
+            with open(f"{path}.txt", "w", encoding="utf-8") as file:
+                file.write(profile.report())
+            with open(f"{path}.folded", "w", encoding="utf-8") as file:
+                file.write(profile.folded())
+        return response
+
+
+class RateLimitMiddleware:
+    """Ограничивает частоту запросов к маршрутам из RATELIMITS
+    и отвечает 429 без вызова view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATELIMIT_CACHE:
+            return None
+        route = request.resolver_match.view_name
+        limits = settings.RATELIMITS.get(route)
+        if not limits or request.method not in limits.get(
+            "methods", ("POST",)
+        ):
+            return None
+        started = time.perf_counter()
+        exceeded = ratelimit.check(request, route, limits)
+        ratelimit.check_seconds.observe(time.perf_counter() - started)
+        if exceeded is None:
+            return None
+        scope, retry_after = exceeded
+        ratelimit.rejected.inc(route=route, scope=scope)
+        return ratelimit.too_many_requests(retry_after)
+
+
+class StaticFilesMiddleware:
+    """Раздает собранную статику из STATIC_ROOT без остальных слоев.
+
+    Индекс файлов строится при первом запросе к статике: после
+    collectstatic воркеры перезапускаются. Если STATIC_ROOT пуст
+    (разработка), запросы проходят дальше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        if not settings.STATIC_ROOT or "://" in self.prefix:
+            raise MiddlewareNotUsed
+        self.files = None
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD") and request.path_info.startswith(
+            self.prefix
+        ):
+            if self.files is None:
+                self.files = staticfiles.scan(settings.STATIC_ROOT)
+            static_file = self.files.get(request.path_info[len(self.prefix):])
+            if static_file is not None:
+                return staticfiles.serve(request, static_file)
+        return self.get_response(request)
+
+
+class CompressionMiddleware:
+    """Сжимает текстовые ответы brotli или gzip (см. core.compression).
+
+    Стоит перед остальными слоями, которые могут читать или дописывать
+    тело ответа, чтобы сжатие выполнялось последним.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return compression.compress_response(request, response)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, берущая пользователя из кэша
+    (см. users.auth)."""
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
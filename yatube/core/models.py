@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 
 
@@ -12,3 +14,38 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class OutboxEvent(models.Model):
+    """Событие transactional outbox.
+
+    Записывается в той же базе и транзакции, что и изменение,
+    и обрабатывается командой process_outbox (см. core.outbox).
+    """
+    topic = models.CharField('Тема', max_length=100)
+    payload = models.TextField('Данные (JSON)')
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    available_at = models.DateTimeField('Обработать после')
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    processed_at = models.DateTimeField('Обработано', null=True, blank=True)
+
+    class Meta:
+        ordering = ('pk',)
+        indexes = [models.Index(fields=['processed_at', 'available_at'])]
+        verbose_name = 'событие outbox'
+        verbose_name_plural = 'события outbox'
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
@@ -0,0 +1,148 @@
+"""Transactional outbox для побочных эффектов записи.
+
+enqueue() записывает событие в той же базе и транзакции, что
+и изменение данных, поэтому событие появляется тогда и только тогда,
+когда изменение зафиксировано. Команда process_outbox читает события
+пачками и вызывает обработчики, зарегистрированные через handler().
+
+Обработчик получает список событий одной темы и должен быть
+идемпотентным: событие может быть обработано повторно, если воркер
+упал после вызова обработчика. При ошибке события темы откладываются
+с экспоненциальной задержкой; после OUTBOX_MAX_ATTEMPTS попыток
+они больше не выбираются. События без обработчиков просто
+помечаются обработанными.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from core import metrics
+from core.models import OutboxEvent
+
+logger = logging.getLogger("core.outbox")
+
+_handlers = {}
+
+processed_events = metrics.registry.counter(
+    "yatube_outbox_events_total",
+    "Обработанные события outbox по теме и результату.",
+    ("topic", "result"),
+)
+
+
+def handler(topic):
+    """Регистрирует обработчик событий темы."""
+
+    def register(function):
+        _handlers.setdefault(topic, []).append(function)
+        return function
+
+    return register
+
+
+def enqueue(topic, data, key=None, using=DEFAULT_DB_ALIAS, delay=None):
+    """Добавляет событие; повтор события с тем же key игнорируется.
+
+    delay (timedelta) откладывает обработку события.
+    """
+    available_at = timezone.now()
+    if delay is not None:
+        available_at += delay
+    event = OutboxEvent(
+        topic=topic,
+        payload=json.dumps(data),
+        key=key,
+        available_at=available_at,
+    )
+    OutboxEvent.objects.using(using).bulk_create(
+        [event], ignore_conflicts=key is not None
+    )
+
+
+def outbox_databases():
+    """Базы, в которых пишутся события: основная и шарды постов."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *settings.POST_SHARDS]))
+
+
+def pending_events(using=DEFAULT_DB_ALIAS):
+    return OutboxEvent.objects.using(using).filter(
+        processed_at__isnull=True,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(
+        seconds=min(2 ** attempts, settings.OUTBOX_MAX_RETRY_DELAY)
+    )
+
+
+def process_batch(using=DEFAULT_DB_ALIAS, batch_size=100):
+    """Обрабатывает одну пачку событий; возвращает ее размер."""
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        events = pending_events(using).filter(available_at__lte=now)
+        if connections[using].features.has_select_for_update_skip_locked:
+            # Несколько воркеров не берут одни и те же события.
+            events = events.select_for_update(skip_locked=True)
+        events = list(events.order_by("pk")[:batch_size])
+
+        by_topic = {}
+        for event in events:
+            by_topic.setdefault(event.topic, []).append(event)
+        done = []
+        for topic, group in by_topic.items():
+            try:
+                with transaction.atomic(using=using):
+                    for function in _handlers.get(topic, ()):
+                        function(group)
+            except Exception as error:
+                logger.exception("Ошибка обработки событий %s", topic)
+                processed_events.inc(len(group), topic=topic, result="error")
+                for event in group:
+                    event.attempts += 1
+                    event.last_error = repr(error)
+                    event.available_at = now + retry_delay(event.attempts)
+                OutboxEvent.objects.using(using).bulk_update(
+                    group, ["attempts", "last_error", "available_at"]
+                )
+            else:
+                processed_events.inc(len(group), topic=topic, result="ok")
+                done.extend(event.pk for event in group)
+        OutboxEvent.objects.using(using).filter(pk__in=done).update(
+            processed_at=now
+        )
+    return len(events)
+
+
+def process_pending(using=DEFAULT_DB_ALIAS, batch_size=100):
+    """Обрабатывает все готовые события базы; возвращает их число."""
+    total = 0
+    while True:
+        processed = process_batch(using, batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
+
+
+def purge_processed(older_than, using=DEFAULT_DB_ALIAS):
+    """Удаляет события, обработанные раньше older_than."""
+    deleted, _ = (
+        OutboxEvent.objects.using(using)
+        .filter(processed_at__lt=older_than)
+        .delete()
+    )
+    return deleted
+
+
+metrics.registry.gauge(
+    "yatube_outbox_pending_events",
+    "Необработанные события outbox во всех базах.",
+    lambda: sum(
+        pending_events(alias).count() for alias in outbox_databases()
+    ),
+)
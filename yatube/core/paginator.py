@@ -0,0 +1,73 @@
+"""Пагинатор с оценкой числа записей для списков админки.
+
+Точный COUNT(*) по большой таблице занимает секунды, поэтому сначала
+считаются не больше ADMIN_EXACT_COUNT_LIMIT + 1 записей. Если записей
+больше, число оценивается по статистике базы (для таблицы без фильтров)
+или берется из кэша, где точный результат хранится
+ADMIN_COUNT_CACHE_TIMEOUT секунд.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+COUNT_CACHE_KEY = "admin_count:{}"
+
+
+def table_estimate(queryset):
+    """Число строк таблицы по статистике базы или None."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE oid = %s::regclass"
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+    elif connection.vendor == "sqlite":
+        # Статистика появляется после ANALYZE; первое число — строки.
+        sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s"
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+def cached_count(queryset):
+    sql = f"{queryset.db}:{queryset.query}"
+    key = COUNT_CACHE_KEY.format(hashlib.md5(sql.encode()).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.ADMIN_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        queryset = self.object_list.order_by()
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        bounded = queryset[:limit + 1].count()
+        if bounded <= limit:
+            return bounded
+        estimate = None
+        if not queryset.query.where:
+            estimate = table_estimate(queryset)
+        if estimate is None:
+            estimate = cached_count(queryset)
+        return max(estimate, bounded)
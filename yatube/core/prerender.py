@@ -0,0 +1,147 @@
+"""Заранее отрисованные страницы ошибок и статические страницы.
+
+Страницы 403, 404, 500 и TemplateView без собственного контекста
+(about:author, about:tech) не зависят от данных, кроме состояния входа:
+шапка показывает гостю ссылки «Войти» и «Регистрация», а пользователю —
+его имя. Поэтому каждая страница рендерится один раз на процесс в два
+варианта байтов — гостевой и пользовательский. В пользовательском
+вместо имени стоит метка, которая при ответе заменяется на
+экранированное имя; так же подставляется адрес на странице 404.
+
+Гостю без cookie сессии страница отдается без обращения к сессии,
+базе и шаблонам; пользователь при общем кэше берется из него
+(см. users.auth).
+Варианты создаются при прогреве (core.warmup) или при первом запросе
+и пересоздаются с наступлением нового года (он выводится в подвале).
+"""
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+from django.urls.resolvers import URLResolver
+from django.utils.html import escape
+from django.views.generic import TemplateView
+
+ERROR_TEMPLATES = {
+    403: "core/403.html",
+    404: "core/404.html",
+    500: "core/500.html",
+}
+
+# Метки подставляемых значений: буквы и цифры не меняются
+# при экранировании HTML.
+USERNAME_MARKER = "prerenderusername7b1e4c"
+PATH_MARKER = "prerenderpath7b1e4c"
+
+_pages = {}
+_year = None
+
+
+def render_page(template_name, view_name, authenticated):
+    """Байты страницы для гостя или пользователя-метки."""
+    path = reverse(view_name) if view_name else "/"
+    request = RequestFactory().get(path)
+    request.resolver_match = resolve(path) if view_name else None
+    request.user = (
+        get_user_model()(username=USERNAME_MARKER)
+        if authenticated
+        else AnonymousUser()
+    )
+    content = render_to_string(
+        template_name, {"path": PATH_MARKER}, request=request
+    )
+    return content.encode()
+
+
+def get_page(template_name, view_name, authenticated):
+    global _year
+    year = datetime.datetime.now().year
+    if year != _year:
+        _pages.clear()
+        _year = year
+    key = (template_name, view_name, authenticated)
+    if key not in _pages:
+        _pages[key] = render_page(template_name, view_name, authenticated)
+    return _pages[key]
+
+
+def request_user(request):
+    """Пользователь запроса или None; ошибки (например, недоступный
+    кэш при ответе 500) дают гостевой вариант."""
+    try:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user
+    except Exception:
+        pass
+    return None
+
+
+def page_response(request, template_name, status=200):
+    match = getattr(request, "resolver_match", None)
+    view_name = match.view_name if match and status == 200 else None
+    user = request_user(request)
+    content = get_page(template_name, view_name, user is not None)
+    if user is not None:
+        content = content.replace(
+            USERNAME_MARKER.encode(), escape(user.get_username()).encode()
+        )
+    content = content.replace(
+        PATH_MARKER.encode(), escape(request.path).encode()
+    )
+    return HttpResponse(content, status=status)
+
+
+def error_response(request, status):
+    return page_response(request, ERROR_TEMPLATES[status], status)
+
+
+class PrerenderedTemplateView(TemplateView):
+    """TemplateView, который отдает заранее отрисованные байты,
+    если у него нет собственного контекста."""
+
+    @classmethod
+    def is_static(cls):
+        return (
+            cls.get_context_data is TemplateView.get_context_data
+            and not cls.extra_context
+        )
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_static() or kwargs:
+            return super().get(request, *args, **kwargs)
+        return page_response(request, self.get_template_names()[0])
+
+
+def static_views(resolver=None, namespace=""):
+    """Пары (имя маршрута, шаблон) статических PrerenderedTemplateView."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f"{namespace}{pattern.namespace}:"
+            yield from static_views(pattern, prefix)
+            continue
+        view_class = getattr(pattern.callback, "view_class", None)
+        if (
+            pattern.name
+            and view_class is not None
+            and issubclass(view_class, PrerenderedTemplateView)
+            and view_class.is_static()
+        ):
+            yield f"{namespace}{pattern.name}", view_class.template_name
+
+
+def prerender_pages():
+    """Рендерит все варианты страниц; возвращает их число."""
+    pages = [(template, None) for template in ERROR_TEMPLATES.values()]
+    pages += [(template, name) for name, template in static_views()]
+    for template_name, view_name in pages:
+        for authenticated in (False, True):
+            get_page(template_name, view_name, authenticated)
+    return len(pages) * 2
@@ -0,0 +1,108 @@
+"""Ограничение частоты запросов на запись: token bucket в кэше.
+
+Корзина хранится в двух ключах кэша: время начала отсчета и число
+взятых жетонов. Жетоны берутся атомарным cache.incr, поэтому корзину
+делят все воркеры; для этого кэш RATELIMIT_CACHE должен быть общим
+(memcached, проверка core.E001), а без него лимиты не применяются.
+Доступно жетонов: capacity + rate * (now - start) - used; когда корзина
+снова полна, отсчет начинается заново, так что всплеск не превышает
+capacity. Каждый взятый жетон продлевает ключи на period секунд: раньше
+корзина наполниться не может, поэтому ключи истекают только у полной.
+
+Лимиты задаются по имени маршрута в settings.RATELIMITS, отдельно
+для пользователя и для IP-адреса, например {"user": "10/m", "ip":
+"30/m"}: 10 запросов подряд, затем по одному каждые 6 секунд.
+По умолчанию ограничиваются только POST-запросы, список методов
+задается ключом "methods".
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from core import metrics
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+check_seconds = metrics.registry.histogram(
+    "yatube_ratelimit_check_seconds",
+    "Время проверки лимитов частоты запросов.",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+rejected = metrics.registry.counter(
+    "yatube_ratelimit_rejected_total",
+    "Запросы, отклоненные лимитом частоты.",
+    ("route", "scope"),
+)
+
+
+def parse_rate(rate):
+    """«10/m» -> (10, 60): емкость корзины и время ее наполнения."""
+    capacity, period = rate.split("/")
+    return int(capacity), PERIODS[period]
+
+
+def take(key, capacity, period, now=None):
+    """Берет жетон из корзины key.
+
+    Возвращает 0, если жетон взят, иначе — через сколько секунд
+    появится следующий.
+    """
+    store = caches[settings.RATELIMIT_CACHE]
+    now = time.time() if now is None else now
+    rate = capacity / period
+    start_key = f"ratelimit:{key}:start"
+    used_key = f"ratelimit:{key}:used"
+
+    start = store.get(start_key)
+    used = None
+    if start is not None:
+        try:
+            used = store.incr(used_key)
+        except ValueError:
+            pass
+    refilled = 0 if used is None else (now - start) * rate
+    if used is None or refilled >= used - 1:
+        # Корзина полна: начинаем отсчет заново с этим запросом.
+        store.set_many({start_key: now, used_key: 1}, period + 1)
+        return 0
+    if used <= capacity + refilled:
+        store.touch(start_key, period + 1)
+        store.touch(used_key, period + 1)
+        return 0
+    # Отклоненный запрос жетон не тратит.
+    store.decr(used_key)
+    return (used - capacity - refilled) / rate
+
+
+def client_ip(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check(request, route, limits):
+    """Проверяет лимиты маршрута; возвращает None или пару
+    (область лимита, секунд до следующего жетона)."""
+    scopes = [("ip", client_ip(request))]
+    if request.user.is_authenticated:
+        scopes.append(("user", request.user.pk))
+    for scope, identity in scopes:
+        rate = limits.get(scope)
+        if rate is None:
+            continue
+        capacity, period = parse_rate(rate)
+        retry_after = take(f"{route}:{scope}:{identity}", capacity, period)
+        if retry_after:
+            return scope, retry_after
+    return None
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse(
+        "Слишком много запросов, попробуйте позже.",
+        content_type="text/plain; charset=utf-8",
+        status=429,
+    )
+    response["Retry-After"] = str(math.ceil(retry_after))
+    return response
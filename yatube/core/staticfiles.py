@@ -0,0 +1,172 @@
+"""Статика с хешами в именах, сжатыми копиями и вечным кэшем.
+
+collectstatic с CompressedManifestStaticFilesStorage кладет в STATIC_ROOT
+файлы вида css/bootstrap.min.3f2a….css, а рядом — копии .gz и, если
+установлен пакет brotli, .br. StaticFilesMiddleware раздает эти файлы
+из процесса: выбирает сжатую копию по Accept-Encoding, отвечает 304
+на условные запросы и помечает файлы с хешем как immutable — их
+содержимое никогда не меняется, новая версия получает новое имя.
+"""
+import json
+import mimetypes
+import os
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+# Текстовые форматы, которые имеет смысл сжимать.
+COMPRESSIBLE = (
+    ".css", ".js", ".map", ".svg", ".ico", ".json", ".txt", ".html", ".xml",
+)
+
+# Файлы меньше порога и копии, сэкономившие меньше 5 %, не сохраняются.
+MIN_COMPRESS_SIZE = 256
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+StaticFile = namedtuple(
+    "StaticFile", "path size mtime content_type immutable encodings"
+)
+
+
+def compress(data):
+    """Сжатые варианты данных: {"gzip": bytes, "br": bytes}."""
+    compressor = zlib.compressobj(9, wbits=16 + zlib.MAX_WBITS)
+    variants = {"gzip": compressor.compress(data) + compressor.flush()}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data)
+    return {
+        encoding: value
+        for encoding, value in variants.items()
+        if len(value) < len(data) * 0.95
+    }
+
+
+def compress_file(path):
+    """Пишет рядом с файлом path копии .gz и .br."""
+    if not path.endswith(COMPRESSIBLE):
+        return []
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    written = []
+    variants = compress(data)
+    for encoding, suffix in ENCODINGS:
+        if encoding in variants:
+            with open(path + suffix, "wb") as file:
+                file.write(variants[encoding])
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хеширует имена файлов и сохраняет сжатые копии."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        files = super().post_process(paths, dry_run, **options)
+        for name, hashed_name, processed in files:
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                names.update(filter(None, (name, hashed_name)))
+        if dry_run:
+            return
+        # CSS обрабатывается в несколько проходов, поэтому сжимаем
+        # только после последнего.
+        for name in sorted(names):
+            compress_file(self.path(name))
+
+
+def immutable_names(root):
+    """Имена с хешем из staticfiles.json или пустое множество."""
+    manifest = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    try:
+        with open(manifest, encoding="utf-8") as file:
+            return set(json.load(file).get("paths", {}).values())
+    except (OSError, ValueError):
+        return set()
+
+
+def scan(root):
+    """Индекс файлов STATIC_ROOT: имя -> StaticFile."""
+    immutable = immutable_names(root)
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith((".gz", ".br")):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            stat = os.stat(path)
+            encodings = {
+                encoding: path + suffix
+                for encoding, suffix in ENCODINGS
+                if os.path.exists(path + suffix)
+            }
+            content_type, _ = mimetypes.guess_type(path)
+            content_type = content_type or "application/octet-stream"
+            if content_type.startswith("text/") or content_type.endswith(
+                "javascript"
+            ):
+                content_type += "; charset=utf-8"
+            files[name] = StaticFile(
+                path=path,
+                size=stat.st_size,
+                mtime=int(stat.st_mtime),
+                content_type=content_type,
+                immutable=name in immutable,
+                encodings=encodings,
+            )
+    return files
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0."""
+    accepted = set()
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, static_file):
+    # Слабый ETag: сжатые копии отличаются байтами, но не содержимым.
+    etag = f'W/"{static_file.mtime:x}-{static_file.size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=static_file.mtime
+    )
+    if response is None:
+        path, encoding = static_file.path, None
+        accepted = accepted_encodings(request)
+        for name, _ in ENCODINGS:
+            if name in static_file.encodings and name in accepted:
+                path, encoding = static_file.encodings[name], name
+                break
+        response = FileResponse(open(path, "rb"))
+        # FileResponse угадал бы тип по имени сжатой копии.
+        response["Content-Type"] = static_file.content_type
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(static_file.mtime)
+    if static_file.encodings:
+        response["Vary"] = "Accept-Encoding"
+    if static_file.immutable:
+        max_age = f"{settings.STATIC_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        max_age = settings.STATIC_MAX_AGE
+    response["Cache-Control"] = f"public, max-age={max_age}"
+    return response
@@ -0,0 +1,161 @@
+"""Профилировщик рендеринга шаблонов.
+
+После install() время рендеринга шаблонов, {% include %}, блоков,
+тегов {% url %}, {% cache %} и сторонних тегов (например, {% thumbnail %}),
+а также фильтров из собственных библиотек (addclass) записывается
+в профиль, открытый через profile(). Профиль отдает рейтинг самых
+дорогих элементов и стеки в свернутом формате для flamegraph.pl
+и speedscope.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template import Engine
+from django.template.base import Node, Template
+from django.template.defaulttags import URLNode
+from django.template.loader_tags import BlockNode, IncludeNode
+from django.templatetags.cache import CacheNode
+
+_local = threading.local()
+
+TIMED_NODES = (IncludeNode, BlockNode, URLNode, CacheNode)
+
+_timed_classes = {}
+_installed = False
+
+
+class Profile:
+    def __init__(self):
+        # Стек: [имя, начало, время дочерних элементов].
+        self.stack = []
+        # Имя -> [вызовы, общее время, собственное время].
+        self.totals = {}
+        # Путь стека -> собственное время.
+        self.stacks = {}
+
+    @contextmanager
+    def frame(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            path = ";".join(frame[0] for frame in self.stack)
+            _, started, children = self.stack.pop()
+            elapsed = time.perf_counter() - started
+            if self.stack:
+                self.stack[-1][2] += elapsed
+            totals = self.totals.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] += elapsed - children
+            self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - children
+
+    def ranked(self, limit=None):
+        """Элементы по убыванию собственного времени."""
+        ranked = sorted(
+            self.totals.items(), key=lambda item: item[1][2], reverse=True
+        )
+        return ranked[:limit]
+
+    def report(self, limit=None):
+        lines = [
+            f"{'self, мс':>10} {'всего, мс':>10} {'вызовы':>7}  элемент"
+        ]
+        for name, (calls, total, own) in self.ranked(limit):
+            lines.append(
+                f"{own * 1000:10.2f} {total * 1000:10.2f} {calls:7}  {name}"
+            )
+        return "\n".join(lines)
+
+    def folded(self):
+        """Стеки в свернутом формате: «a;b;c микросекунды»."""
+        return "\n".join(
+            f"{path} {round(own * 1e6)}"
+            for path, own in sorted(self.stacks.items())
+        )
+
+
+@contextmanager
+def profile(root="request"):
+    """Собирает профиль рендеринга шаблонов внутри блока."""
+    current = Profile()
+    _local.profile = current
+    try:
+        with current.frame(root):
+            yield current
+    finally:
+        _local.profile = None
+
+
+def is_timed(node_class):
+    timed = _timed_classes.get(node_class)
+    if timed is None:
+        timed = _timed_classes[node_class] = issubclass(
+            node_class, TIMED_NODES
+        ) or not node_class.__module__.startswith("django.")
+    return timed
+
+
+def node_label(node):
+    if isinstance(node, IncludeNode):
+        return "include:" + node.template.token.strip("'\"")
+    if isinstance(node, BlockNode):
+        return f"block:{node.name}"
+    return f"tag:{type(node).__name__}"
+
+
+def wrap_node_render(render):
+    @functools.wraps(render)
+    def render_annotated(self, context):
+        current = getattr(_local, "profile", None)
+        if current is None or not is_timed(type(self)):
+            return render(self, context)
+        with current.frame(node_label(self)):
+            return render(self, context)
+
+    return render_annotated
+
+
+def wrap_template_render(render):
+    @functools.wraps(render)
+    def template_render(self, context):
+        current = getattr(_local, "profile", None)
+        if current is None:
+            return render(self, context)
+        with current.frame(f"template:{self.name}"):
+            return render(self, context)
+
+    return template_render
+
+
+def wrap_filter(name, function):
+    @functools.wraps(function)
+    def timed_filter(*args, **kwargs):
+        current = getattr(_local, "profile", None)
+        if current is None:
+            return function(*args, **kwargs)
+        with current.frame(f"filter:{name}"):
+            return function(*args, **kwargs)
+
+    return timed_filter
+
+
+def install():
+    """Подменяет методы рендеринга; вызывается один раз за процесс."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Node.render_annotated = wrap_node_render(Node.render_annotated)
+    Template.render = wrap_template_render(Template.render)
+    for library in Engine.get_default().template_libraries.values():
+        library.filters = {
+            name: (
+                function
+                if function.__module__.startswith("django.")
+                else wrap_filter(name, function)
+            )
+            for name, function in library.filters.items()
+        }
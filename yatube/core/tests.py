@@ -1,10 +1,54 @@
+import gzip
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import zlib
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import resolve, reverse
+
+from core import (compression, db_router, metrics, outbox, prerender,
+                  ratelimit, template_profiler, views, warmup)
+from core.checks import check_ratelimit_cache
+from core.db_stats import normalize_sql
+from core.models import OutboxEvent
+from core.paginator import EstimatedCountPaginator
+from posts.forms import CommentForm
+from posts.models import Group, Post
+from users.auth import USER_CACHE_KEY, get_cached_user
+from users.checks import check_shared_cache
 
 User = get_user_model()
 
+# Два экземпляра кэша над одним хранилищем изображают общий кэш
+# воркеров (memcached) без внешнего сервера.
+SHARED_CACHE = {
+    "BACKEND": "core.cache.InstrumentedLocMemCache",
+    "LOCATION": "shared",
+}
+shared_cache = override_settings(
+    CACHES={"default": SHARED_CACHE, "worker": SHARED_CACHE},
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTH_USER_CACHE="default",
+)
+
 
 class ViewTestClass(TestCase):
     def setUp(self):
@@ -15,10 +59,886 @@ class ViewTestClass(TestCase):
 
     def test_auth_error_page_404(self):
         response = self.authorized_client.get("/fake_page/")
-        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
-        self.assertTemplateUsed(response, "core/404.html")
+        self.assertContains(
+            response,
+            "Страницы с адресом /fake_page/ не существует",
+            status_code=HTTPStatus.NOT_FOUND,
+        )
+        self.assertContains(
+            response,
+            "Пользователь: test_user",
+            status_code=HTTPStatus.NOT_FOUND,
+        )
 
     def test_guest_error_page_404(self):
         response = self.client.get("/fake_page/")
+        self.assertContains(
+            response,
+            "Страницы с адресом /fake_page/ не существует",
+            status_code=HTTPStatus.NOT_FOUND,
+        )
+        self.assertNotContains(
+            response, "Пользователь:", status_code=HTTPStatus.NOT_FOUND
+        )
+
+
+@mock.patch.object(
+    db_router,
+    "get_replicas",
+    return_value={"replica1": {"weight": 1}, "replica2": {"weight": 1}},
+)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        db_router.use_replicas(True)
+
+    def tearDown(self):
+        db_router.reset_state()
+
+    def test_write_goes_to_primary(self, _):
+        self.assertEqual(self.router.db_for_write(User), "default")
+        self.assertTrue(db_router.wrote_to_primary())
+
+    def test_read_after_write_goes_to_primary(self, _):
+        self.router.db_for_write(User)
+        with mock.patch.object(
+            db_router, "replica_status", return_value=(True, 0.0)
+        ):
+            self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_read_outside_request_goes_to_primary(self, _):
+        db_router.reset_state()
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_read_skips_unhealthy_and_lagging_replicas(self, _):
+        status = {"replica1": (False, 0.0), "replica2": (True, 100.0)}
+        with mock.patch.object(
+            db_router, "replica_status", side_effect=status.get
+        ):
+            self.assertEqual(self.router.db_for_read(User), "default")
+
+        status["replica2"] = (True, 1.0)
+        with mock.patch.object(
+            db_router, "replica_status", side_effect=status.get
+        ):
+            self.assertEqual(self.router.db_for_read(User), "replica2")
+
+
+class ReplicaPinningTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test_user")
+        self.client.force_login(self.user)
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.post("/create/", {"text": "Новый пост"})
+        self.assertIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_read_does_not_pin(self):
+        response = self.client.get("/")
+        self.assertNotIn(
+            settings.REPLICA_PIN_COOKIE_NAME, response.cookies
+        )
+
+
+class QueryTimingMiddlewareTest(TestCase):
+    def test_server_timing_header(self):
+        response = self.client.get("/")
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_slow_queries_logged_with_view_name(self):
+        with self.assertLogs("core.slow_sql", "WARNING") as logs:
+            self.client.get("/profile/missing/")
+        self.assertIn("posts:profile", logs.output[0])
+        self.assertIn("?", logs.output[0])
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT *  FROM t WHERE a = 'x' AND b IN (%s, %s, %s)"
+                " LIMIT 10"
+            ),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?",
+        )
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.client.get("/")
+
+    def test_metrics_exposition(self):
+        response = self.client.get("/metrics/")
+        text = response.content.decode()
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn("# TYPE yatube_view_latency_seconds histogram", text)
+        self.assertIn(
+            'yatube_responses_total{view="posts:index",status="200"}', text
+        )
+        self.assertIn('yatube_view_latency_seconds_bucket{view=', text)
+        self.assertIn(
+            'yatube_cache_requests_total{namespace="index_page",', text
+        )
+
+    def test_metrics_aggregated_across_processes(self):
+        key = ["posts:index", "200"]
+        current = dict(
+            (tuple(sample[0]), sample[1])
+            for sample in metrics.responses.snapshot()
+        )[tuple(key)]
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "metrics_1.json"), "w") as file:
+                json.dump({"yatube_responses_total": [[key, 5]]}, file)
+            with override_settings(METRICS_DIR=directory):
+                text = metrics.registry.expose()
+
+        self.assertIn(
+            'yatube_responses_total{view="posts:index",status="200"} '
+            f"{current + 5}",
+            text,
+        )
+
+    def test_foreign_snapshot_files_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename, content in (
+                ("metrics_backup.json", "{}"),
+                ("metrics_2.json", "{broken"),
+            ):
+                with open(os.path.join(directory, filename), "w") as file:
+                    file.write(content)
+            with override_settings(METRICS_DIR=directory):
+                response = self.client.get("/metrics/")
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_hidden_from_other_addresses(self):
+        response = self.client.get("/metrics/")
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
-        self.assertTemplateUsed(response, "core/404.html")
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token_required(self):
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+        response = self.client.get(
+            "/metrics/", HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class TemplateProfilerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test_user")
+        self.client.force_login(self.user)
+
+    def test_profile_includes_templates_tags_and_filters(self):
+        template_profiler.install()
+        with template_profiler.profile() as profile:
+            render_to_string(
+                "posts/includes/comments.html",
+                {"comments": [], "post": {"id": 1}, "form": CommentForm()},
+            )
+        names = set(profile.totals)
+
+        self.assertIn("template:posts/includes/comments.html", names)
+        self.assertIn("tag:URLNode", names)
+        self.assertIn("filter:addclass", names)
+        self.assertIn(
+            "request;template:posts/includes/comments.html",
+            profile.folded(),
+        )
+
+    def test_middleware_dumps_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                TEMPLATE_PROFILING=True, TEMPLATE_PROFILER_DIR=directory
+            ), self.assertLogs("core.template_profiler", "INFO"):
+                Client().get("/")
+            files = sorted(os.listdir(directory))
+
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].endswith("posts_index.folded"))
+
+
+class OutboxTest(TestCase):
+    handled = []
+    failures = 0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Тестовый обработчик не должен пережить этот класс.
+        cls.handlers = mock.patch.dict(outbox._handlers)
+        cls.handlers.start()
+
+        @outbox.handler("test.event")
+        def handle(events):
+            if cls.failures:
+                cls.failures -= 1
+                raise RuntimeError("сбой обработчика")
+            cls.handled.append([event.data["number"] for event in events])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.handlers.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.handled.clear()
+        OutboxTest.failures = 0
+
+    def test_enqueue_follows_transaction(self):
+        with transaction.atomic():
+            outbox.enqueue("test.event", {"number": 1})
+            transaction.set_rollback(True)
+        outbox.enqueue("test.event", {"number": 2})
+
+        self.assertEqual(outbox.process_pending(), 1)
+        self.assertEqual(self.handled, [[2]])
+        self.assertEqual(outbox.process_pending(), 0)
+
+    def test_events_processed_in_batches(self):
+        for number in range(5):
+            outbox.enqueue("test.event", {"number": number})
+        outbox.enqueue("test.unhandled", {})
+
+        self.assertEqual(outbox.process_pending(batch_size=2), 6)
+        self.assertEqual(self.handled, [[0, 1], [2, 3], [4]])
+        self.assertFalse(outbox.pending_events().exists())
+
+    def test_same_key_enqueued_once(self):
+        outbox.enqueue("test.event", {"number": 1}, key="event-1")
+        outbox.enqueue("test.event", {"number": 1}, key="event-1")
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_failed_events_retried_later(self):
+        OutboxTest.failures = 1
+        outbox.enqueue("test.event", {"number": 1})
+        with self.assertLogs("core.outbox", "ERROR"):
+            outbox.process_pending()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("сбой обработчика", event.last_error)
+        self.assertIsNone(event.processed_at)
+        # Повтор только после задержки.
+        self.assertEqual(outbox.process_pending(), 0)
+
+        OutboxEvent.objects.update(available_at=event.created)
+        call_command("process_outbox", "--once", stdout=StringIO())
+        self.assertEqual(self.handled, [[1]])
+
+    def test_post_write_enqueues_event(self):
+        user = User.objects.create_user(username="author")
+        client = Client()
+        client.force_login(user)
+        client.post(reverse("posts:post_create"), {"text": "Текст"})
+
+        event = OutboxEvent.objects.get(topic="post.created")
+        self.assertEqual(event.data["author"], user.pk)
+
+
+@override_settings(RATELIMIT_CACHE="default")
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="author")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_token_bucket(self):
+        now = 1000.0
+        for _ in range(3):
+            self.assertEqual(ratelimit.take("test", 3, 60, now), 0)
+        self.assertAlmostEqual(ratelimit.take("test", 3, 60, now), 20)
+        # Через 20 секунд появляется один жетон.
+        self.assertEqual(ratelimit.take("test", 3, 60, now + 20), 0)
+        self.assertGreater(ratelimit.take("test", 3, 60, now + 20), 0)
+        # Полная корзина не копит жетоны сверх емкости.
+        for _ in range(3):
+            self.assertEqual(ratelimit.take("test", 3, 60, now + 600), 0)
+        self.assertGreater(ratelimit.take("test", 3, 60, now + 600), 0)
+
+    def test_bucket_kept_until_full(self):
+        """Ключи корзины истекают, только когда она снова полна:
+        клиент, который держится у предела, не получает новую."""
+        clock = [1000.0]
+        accepted = 0
+        with mock.patch("time.time", side_effect=lambda: clock[0]):
+            for second in range(600):
+                clock[0] = 1000.0 + second
+                accepted += ratelimit.take("held", 10, 60) == 0
+        # 10 жетонов сразу и затем по одному каждые 6 секунд.
+        self.assertLessEqual(accepted, 10 + 600 // 6)
+
+    @override_settings(
+        RATELIMITS={"posts:post_create": {"user": "2/m", "ip": "10/m"}}
+    )
+    def test_write_view_limited_per_user(self):
+        url = reverse("posts:post_create")
+        for _ in range(2):
+            response = self.client.post(url, {"text": "Текст"})
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.client.post(url, {"text": "Текст"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        # GET-запросы не ограничиваются.
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+
+        other = Client()
+        other.force_login(User.objects.create_user(username="other"))
+        response = other.post(url, {"text": "Текст"})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(RATELIMITS={"users:signup": {"ip": "1/h"}})
+    def test_signup_limited_per_ip(self):
+        url = reverse("users:signup")
+        data = {"username": "new_user"}
+        self.assertEqual(Client().post(url, data).status_code, HTTPStatus.OK)
+        self.assertEqual(Client().post(url, data).status_code, 429)
+        response = Client(REMOTE_ADDR="10.0.0.1").post(url, data)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(
+        RATELIMITS={"users:signup": {"ip": "1/h"}}, RATELIMIT_CACHE=None
+    )
+    def test_not_applied_without_shared_cache(self):
+        url = reverse("users:signup")
+        data = {"username": "new_user"}
+        for _ in range(2):
+            response = Client().post(url, data)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_local_cache_rejected_by_check(self):
+        def check_ids():
+            return [error.id for error in check_ratelimit_cache(None)]
+
+        self.assertEqual(check_ids(), ["core.E001"])
+        with self.settings(RATELIMIT_CACHE=None, DEBUG=False):
+            self.assertEqual(check_ids(), ["core.W001"])
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(3):
+            User.objects.create_user(username=f"user_{number}")
+
+    def test_small_result_counted_exactly(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+        self.assertEqual(paginator.count, 3)
+        User.objects.create_user(username="user_3")
+        paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+        self.assertEqual(paginator.count, 4)
+
+    def test_large_result_count_cached(self):
+        User.objects.create_user(username="user_3")
+        users = User.objects.filter(username__startswith="user").order_by(
+            "pk"
+        )
+        self.assertEqual(EstimatedCountPaginator(users, 2).count, 4)
+
+        User.objects.create_user(username="user_4")
+        paginator = EstimatedCountPaginator(users, 2)
+        # Ограниченный подсчет и чтение кэша, без полного COUNT(*).
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 4)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_admin_changelist_uses_estimate(self):
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse("admin:posts_post_changelist"))
+        changelist = response.context["cl"]
+        self.assertIsInstance(changelist.paginator, EstimatedCountPaginator)
+        self.assertIsNone(changelist.full_result_count)
+
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username="author")
+        self.groups = [
+            Group.objects.create(
+                title=f"Группа {number}",
+                slug=f"group-{number}",
+                description="Описание",
+            )
+            for number in range(3)
+        ]
+        for number, group in enumerate(self.groups):
+            for _ in range(number):
+                Post.objects.create(text="Пост", author=author, group=group)
+
+    def test_hot_groups_ordered_by_recent_posts(self):
+        self.assertEqual(
+            warmup.hot_groups(5, days=7), self.groups[:0:-1]
+        )
+
+    def test_warm_up_command_refuses_process_local_cache(self):
+        with self.assertRaises(CommandError):
+            call_command("warm_up", stdout=StringIO())
+
+    @mock.patch(
+        "core.management.commands.warm_up.is_process_local",
+        return_value=False,
+    )
+    def test_warm_up_primes_fragment_cache(self, _):
+        out = StringIO()
+        call_command("warm_up", "--groups=1", stdout=out)
+
+        self.assertIsNotNone(
+            cache.get(make_template_fragment_key("index_page", [1]))
+        )
+        self.assertIsNotNone(
+            cache.get(make_template_fragment_key("group_page", ["group-2", 1]))
+        )
+        self.assertIsNone(
+            cache.get(make_template_fragment_key("group_page", ["group-1", 1]))
+        )
+        self.assertIn("/group/group-2/", out.getvalue())
+
+    def test_templates_and_urls_loaded(self):
+        self.assertGreater(warmup.load_templates(), 0)
+        self.assertGreater(warmup.resolve_urls(), 0)
+
+
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(
+            STATIC_ROOT=cls.root.name,
+            STATICFILES_STORAGE=(
+                "core.staticfiles.CompressedManifestStaticFilesStorage"
+            ),
+        )
+        cls.settings.enable()
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        url = static("css/bootstrap.min.css")
+        self.assertRegex(url, r"^/static/css/bootstrap\.min\.\w{12}\.css$")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertIn("immutable", response["Cache-Control"])
+        path = os.path.join(self.root.name, url[len("/static/"):] + ".gz")
+        with open(path, "rb") as file:
+            self.assertEqual(b"".join(response.streaming_content), file.read())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_unhashed_name_gets_short_cache(self):
+        response = self.client.get("/static/css/bootstrap.min.css")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(
+            response["Cache-Control"],
+            f"public, max-age={settings.STATIC_MAX_AGE}",
+        )
+
+    def test_pages_link_hashed_assets(self):
+        response = self.client.get(reverse("posts:index"))
+        self.assertContains(response, static("js/bootstrap.min.js"))
+        self.assertNotContains(response, 'href="img/')
+
+
+class CheckStaticTest(SimpleTestCase):
+    def check_template(self, html):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "page.html"), "w") as file:
+                file.write(html)
+            template = dict(settings.TEMPLATES[0])
+            template["DIRS"] = [directory, *template["DIRS"]]
+            with override_settings(TEMPLATES=[template]):
+                call_command(
+                    "check_static", stdout=StringIO(), stderr=StringIO()
+                )
+
+    def test_project_templates_pass(self):
+        self.check_template("{% load static %}")
+
+    def test_broken_references_reported(self):
+        pages = [
+            "{% load static %}<img src=\"{% static 'img/missing.png' %}\">",
+            "<link rel=\"icon\" href=\"img/fav/favicon-16x16.png\">",
+            "{% load static %}<link rel=\"stylesheet\" "
+            "href=\"{% static 'js/bootstrap.min.js' %}\">",
+        ]
+        for html in pages:
+            with self.subTest(html=html):
+                with self.assertRaises(CommandError):
+                    self.check_template(html)
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get(
+            "/", HTTP_ACCEPT_ENCODING="gzip, deflate, br"
+        )
+
+    def test_html_page_gzipped(self):
+        plain = self.client.get(reverse("posts:index"))
+        self.assertNotIn("Content-Encoding", plain)
+
+        response = self.client.get(
+            reverse("posts:index"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(
+            int(response["Content-Length"]), len(response.content)
+        )
+
+    def test_csrf_page_padded_and_never_brotli(self):
+        user = User.objects.create_user(username="author")
+        self.client.force_login(user)
+        with mock.patch.object(compression, "brotli", mock.Mock()):
+            response = self.client.get(
+                reverse("posts:post_create"), HTTP_ACCEPT_ENCODING="br, gzip"
+            )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        # Флаг FNAME: в заголовке есть случайное дополнение.
+        self.assertEqual(response.content[3], compression.GZIP_FNAME)
+        self.assertContains(
+            HttpResponse(gzip.decompress(response.content)),
+            "csrfmiddlewaretoken",
+        )
+
+    def test_brotli_preferred_without_csrf(self):
+        with mock.patch.object(compression, "brotli", mock.Mock()):
+            self.assertEqual(
+                compression.choose_encoding(self.request, False), "br"
+            )
+            self.assertEqual(
+                compression.choose_encoding(self.request, True), "gzip"
+            )
+
+    def test_streaming_response_compressed_incrementally(self):
+        chunks = [b"post,author\n" * 100, b"next,chunk\n" * 100]
+        response = compression.compress_response(
+            self.request,
+            StreamingHttpResponse(iter(chunks), content_type="text/csv"),
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        parts = list(response.streaming_content)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(parts[0]), chunks[0])
+        self.assertEqual(gzip.decompress(b"".join(parts)), b"".join(chunks))
+
+    def test_tiny_binary_and_encoded_bodies_skipped(self):
+        responses = [
+            HttpResponse(b"ok", content_type="text/plain"),
+            HttpResponse(b"\x89PNG" * 100, content_type="image/png"),
+        ]
+        encoded = HttpResponse(b"x" * 1000, content_type="text/csv")
+        encoded["Content-Encoding"] = "gzip"
+        responses.append(encoded)
+        for response in responses:
+            with self.subTest(content_type=response["Content-Type"]):
+                content = response.content
+                response = compression.compress_response(
+                    self.request, response
+                )
+                self.assertEqual(response.content, content)
+
+
+@shared_cache
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reader", password="Old-passw0rd!"
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("about:author")
+
+    def test_logged_in_request_needs_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Пользователь: reader")
+
+    def test_invalidation_reaches_other_cache_instance(self):
+        self.client.get(self.url)
+        self.assertIsNot(caches["worker"], caches["default"])
+        key = USER_CACHE_KEY.format(self.user.pk)
+        with self.settings(AUTH_USER_CACHE="worker"):
+            self.assertIsNotNone(caches["worker"].get(key))
+            self.user.set_password("New-passw0rd!")
+            self.user.save()
+        self.assertIsNone(caches["default"].get(key))
+        self.assertNotContains(self.client.get(self.url), "Пользователь:")
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.db",
+        AUTH_USER_CACHE=None,
+    )
+    def test_without_shared_cache_user_is_read_from_db(self):
+        client = Client()
+        client.force_login(self.user)
+        with self.assertNumQueries(2):
+            response = client.get(self.url)
+        self.assertContains(response, "Пользователь: reader")
+        self.assertIsNone(cache.get(USER_CACHE_KEY.format(self.user.pk)))
+
+    def test_password_change_ends_other_sessions(self):
+        other = Client()
+        other.force_login(self.user)
+        self.assertContains(other.get(self.url), "Пользователь: reader")
+
+        response = self.client.post(
+            reverse("users:password_change"),
+            {
+                "old_password": "Old-passw0rd!",
+                "new_password1": "New-passw0rd!",
+                "new_password2": "New-passw0rd!",
+            },
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertContains(self.client.get(self.url), "Пользователь: reader")
+        self.assertNotContains(other.get(self.url), "Пользователь:")
+
+    def test_logout_invalidates_session(self):
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get(self.url)
+        self.client.get(reverse("users:logout"))
+
+        stale = Client()
+        stale.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        self.assertNotContains(stale.get(self.url), "Пользователь:")
+
+    def test_anonymous_request_skips_session(self):
+        request = RequestFactory().get(self.url)
+        request.session = mock.MagicMock()
+        self.assertFalse(get_cached_user(request).is_authenticated)
+        self.assertEqual(request.session.mock_calls, [])
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def check_ids(self):
+        return [error.id for error in check_shared_cache(None)]
+
+    def test_db_sessions_without_user_cache_pass(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db"
+    )
+    def test_cached_sessions_in_local_cache_rejected(self):
+        self.assertEqual(self.check_ids(), ["users.E001"])
+
+    @override_settings(AUTH_USER_CACHE="default")
+    def test_user_cache_in_local_cache_rejected(self):
+        self.assertEqual(self.check_ids(), ["users.E002"])
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "cache_table",
+            }
+        },
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        AUTH_USER_CACHE="default",
+    )
+    def test_shared_cache_passes(self):
+        self.assertEqual(self.check_ids(), [])
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-диалог для SMTPStandIn."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 Bye")
+                return
+            if command == "MAIL":
+                recipients = []
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                    continue
+                recipients.append(address)
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b".\r\n"):
+                    data.append(data_line)
+                server.messages.append((recipients, b"".join(data)))
+            self.reply("250 OK")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Локальный SMTP-сервер, запоминающий письма и соединения."""
+
+    daemon_threads = True
+
+    def __init__(self, rejected=()):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.rejected = set(rejected)
+        self.messages = []
+        self.connections = 0
+
+
+@override_settings(
+    EMAIL_BACKEND="core.mail.QueuedEmailBackend",
+    QUEUED_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class MailQueueTest(TestCase):
+    def start_smtp(self, rejected=()):
+        server = SMTPStandIn(rejected)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings_override = override_settings(
+            QUEUED_EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=server.server_address[1],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return server
+
+    def queued(self):
+        return OutboxEvent.objects.filter(topic="mail.send")
+
+    def test_messages_queued_once(self):
+        for _ in range(3):
+            mail.send_mail("Тема", "Текст", None, ["user@example.com"])
+        mail.send_mail("Тема", "Другой текст", None, ["user@example.com"])
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(self.queued().count(), 2)
+
+    def test_password_reset_sent_by_worker(self):
+        User.objects.create_user(
+            username="reader", email="reader@example.com", password="pass"
+        )
+        response = self.client.post(
+            reverse("users:password_reset"), {"email": "reader@example.com"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(mail.outbox, [])
+
+        outbox.process_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["reader@example.com"])
+        self.assertIn("/auth/reset/", mail.outbox[0].body)
+
+    def test_batch_sent_over_one_smtp_connection(self):
+        server = self.start_smtp()
+        for number in range(3):
+            mail.send_mail(
+                f"Тема {number}", "Текст", None, [f"user{number}@example.com"]
+            )
+
+        outbox.process_pending()
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(
+            [recipients for recipients, _ in server.messages],
+            [[f"user{number}@example.com"] for number in range(3)],
+        )
+        self.assertFalse(outbox.pending_events().exists())
+
+    def test_failed_message_retried_later(self):
+        server = self.start_smtp(rejected={"bad@example.com"})
+        for address in ("first@example.com", "bad@example.com",
+                        "last@example.com"):
+            mail.send_mail("Тема", "Текст", None, [address])
+
+        with self.assertLogs("core.mail", "WARNING"):
+            outbox.process_pending()
+
+        self.assertEqual(len(server.messages), 2)
+        # После отказа следующее письмо ушло через новое соединение.
+        self.assertEqual(server.connections, 2)
+        retry = outbox.pending_events().get()
+        self.assertEqual(retry.data["attempt"], 1)
+        self.assertEqual(retry.data["message"]["to"], ["bad@example.com"])
+        self.assertGreater(retry.available_at, retry.created)
+
+        with override_settings(MAIL_MAX_ATTEMPTS=2):
+            retry.available_at = retry.created
+            retry.save()
+            with self.assertLogs("core.mail", "ERROR"):
+                outbox.process_pending()
+        self.assertFalse(outbox.pending_events().exists())
+        self.assertEqual(len(server.messages), 2)
+
+
+@shared_cache
+class PrerenderedPagesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="<b>reader</b>")
+
+    def test_pages_served_without_queries_or_templates(self):
+        prerender.prerender_pages()
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse("about:tech"))
+        for url in (reverse("about:author"), "/missing/<script>/"):
+            for current in (self.client, client):
+                with self.subTest(url=url, user=current is client):
+                    with self.assertNumQueries(0):
+                        response = current.get(url)
+                    self.assertEqual(response.templates, [])
+        for text in ("&lt;b&gt;reader&lt;/b&gt;", "/missing/&lt;script&gt;/"):
+            self.assertContains(response, text, status_code=404)
+        self.assertNotContains(response, "<script>", status_code=404)
+
+    def test_variant_matches_full_render(self):
+        url = reverse("about:author")
+        request = RequestFactory().get(url)
+        request.resolver_match = resolve(url)
+        request.user = self.user
+        expected = render_to_string("about/author.html", request=request)
+
+        response = prerender.page_response(request, "about/author.html")
+        self.assertEqual(response.content.decode(), expected)
+
+    def test_error_handlers(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        for status, handler in (
+            (HTTPStatus.FORBIDDEN, views.permission_denied),
+            (HTTPStatus.INTERNAL_SERVER_ERROR, views.server_error),
+        ):
+            with self.subTest(status=status):
+                args = () if status == HTTPStatus.INTERNAL_SERVER_ERROR else (
+                    None,
+                )
+                response = handler(request, *args)
+                self.assertEqual(response.status_code, status)
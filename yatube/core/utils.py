@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_created(*models):
+    """Сохраняет переданное значение поля created при bulk_create.
+
+    Поле created модели CreatedModel заполняется автоматически
+    (auto_now_add), поэтому при переносе и генерации записей
+    автоматическое заполнение на время отключается.
+    """
+    fields = [model._meta.get_field("created") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
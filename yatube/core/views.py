@@ -1,10 +1,17 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core import prerender
+from core.metrics import registry
 
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
-    # выводить её в шаблон пользовательской страницы 404 мы не станем
-    return render(request, "core/404.html", {"path": request.path}, status=404)
+    # выводить её в шаблон пользовательской страницы 404 мы не станем.
+    # Страницы ошибок отдаются заранее отрисованными (core.prerender).
+    return prerender.error_response(request, 404)
 
 
 def csrf_failure(request, reason=""):
@@ -12,8 +19,26 @@ def csrf_failure(request, reason=""):
 
 
 def server_error(request):
-    return render(request, "core/500.html", status=500)
+    return prerender.error_response(request, 500)
 
 
 def permission_denied(request, exception):
-    return render(request, "core/403.html", status=403)
+    return prerender.error_response(request, 403)
+
+
+def metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return constant_time_compare(
+            request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+        )
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики всех процессов в формате Prometheus."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        registry.expose(), content_type="text/plain; version=0.0.4"
+    )
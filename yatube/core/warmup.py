@@ -0,0 +1,141 @@
+"""Прогрев воркера после деплоя.
+
+Первые запросы к свежему воркеру разбирают шаблоны, заполняют
+URL-резолвер и собирают страницы с пустым кэшем. warm_up делает это
+заранее: загружает все шаблоны (при DEBUG = False они остаются
+в cached loader), строит таблицы резолвера, готовит байты страниц
+ошибок и «об авторе» (core.prerender) и рендерит первые страницы
+главной и самых активных групп, заполняя кэш фрагментов и миниатюр.
+Все это, кроме общего кэша, живет в памяти процесса, поэтому warm_up
+запускается в каждом воркере из wsgi.py при WARMUP_ON_START. Команда
+warm_up при общем кэше заполняет только его (prime_pages).
+"""
+import logging
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+from django.urls.resolvers import URLResolver
+from django.utils import timezone
+
+from core import prerender
+from posts.models import Group, Post
+from posts.sharding import get_shards
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = (".html", ".txt")
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    for loader in engine.engine.template_loaders:
+        for inner in getattr(loader, "loaders", [loader]):
+            if not hasattr(inner, "get_dirs"):
+                continue
+            for directory in inner.get_dirs():
+                for root, _, files in os.walk(directory):
+                    names.update(
+                        os.path.relpath(os.path.join(root, name), directory)
+                        for name in files
+                        if name.endswith(TEMPLATE_SUFFIXES)
+                    )
+    return sorted(names)
+
+
+def load_templates():
+    """Компилирует шаблоны; возвращает число загруженных."""
+    loaded = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name.replace(os.sep, "/"))
+            except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+                logger.warning("Шаблон %s не загружен: %s", name, error)
+            else:
+                loaded += 1
+    return loaded
+
+
+def resolve_urls(resolver=None):
+    """Заполняет таблицы reverse() для всех пространств имен;
+    возвращает число именованных маршрутов."""
+    resolver = resolver or get_resolver()
+    count = sum(1 for key in resolver.reverse_dict if isinstance(key, str))
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            count += resolve_urls(pattern)
+    return count
+
+
+def hot_groups(limit, days):
+    """Группы с наибольшим числом постов за последние days дней."""
+    since = timezone.now() - timedelta(days=days)
+    counts = Counter()
+    for shard in get_shards():
+        counts.update(
+            dict(
+                Post.objects.using(shard)
+                .filter(created__gte=since, group__isnull=False)
+                .values_list("group_id")
+                .annotate(posts=Count("pk"))
+                .order_by()
+            )
+        )
+    ids = [group_id for group_id, _ in counts.most_common(limit)]
+    groups = Group.objects.in_bulk(ids)
+    return [groups[pk] for pk in ids if pk in groups]
+
+
+def render_page(path):
+    """Рендерит страницу для гостя, как это сделал бы запрос."""
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    return response.status_code
+
+
+def prime_pages(groups=None):
+    """Рендерит первые страницы главной и горячих групп."""
+    if groups is None:
+        groups = settings.WARMUP_HOT_GROUPS
+    paths = [reverse("posts:index")]
+    paths += [
+        reverse("posts:group_list", kwargs={"slug": group.slug})
+        for group in hot_groups(groups, settings.WARMUP_HOT_DAYS)
+    ]
+    for path in paths:
+        render_page(path)
+    return paths
+
+
+def warm_up(groups=None):
+    """Полный прогрев; возвращает сводку для лога и команды."""
+    started = time.monotonic()
+    summary = {
+        "templates": load_templates(),
+        "urls": resolve_urls(),
+        "prerendered": prerender.prerender_pages(),
+        "pages": prime_pages(groups),
+    }
+    summary["seconds"] = time.monotonic() - started
+    logger.info(
+        "Прогрев: %(templates)d шаблонов, %(urls)d маршрутов, "
+        "%(seconds).2f с",
+        summary,
+    )
+    return summary
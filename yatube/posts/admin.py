@@ -1,16 +1,22 @@
 from django.contrib import admin
 
+from core.admin import ScalableModelAdmin
+
+from .exports import EXPORT_ACTIONS
 from .models import Comment, Follow, Group, Post
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableModelAdmin):
     """Настройка раздела постов."""
 
     list_display = ("id", "text", "created", "author", "group")
     list_editable = ("group",)
+    list_select_related = ("author", "group")
+    autocomplete_fields = ("author", "group")
     search_fields = ("text",)
     list_filter = ("created",)
+    actions = EXPORT_ACTIONS
     empty_value_display = "-пусто-"
     list_per_page = 15
 
@@ -28,19 +34,22 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableModelAdmin):
     """Настройка раздела комментариев."""
 
     list_display = ("id", "post", "author", "text", "created")
     list_editable = ("author",)
-    search_fields = ("text",)
-    list_filter = ("author",)
+    list_select_related = ("post", "author")
+    autocomplete_fields = ("post", "author")
+    search_fields = ("text", "author__username")
+    list_filter = ("created",)
+    actions = EXPORT_ACTIONS
     empty_value_display = "-пусто-"
     list_per_page = 10
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableModelAdmin):
     """Класс настройки раздела подписок."""
 
     list_display = (
@@ -51,6 +60,9 @@ class FollowAdmin(admin.ModelAdmin):
     )
 
     list_editable = ('author', "user",)
-    list_filter = ('author',)
+    list_select_related = ('author', 'user')
+    autocomplete_fields = ('author', 'user')
+    list_filter = ('created',)
+    actions = EXPORT_ACTIONS
     list_per_page = 10
-    search_fields = ('author',)
+    search_fields = ('author__username', 'user__username')
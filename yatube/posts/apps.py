@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = "posts"
+
+    def ready(self):
+        # Регистрируем обработчики сигналов и проверки.
+        from . import checks, events, following, sharding  # noqa: F401
@@ -0,0 +1,80 @@
+"""Архив старых постов и комментариев.
+
+Посты старше ARCHIVE_AFTER_DAYS дней команда archive_posts переносит
+в таблицы ArchivedPost и ArchivedComment того же шарда, поэтому
+основная таблица постов и ее индексы остаются небольшими. Страницы
+поста и профиля при промахе в основной таблице читают архив.
+"""
+from django.http import Http404
+
+from .models import ArchivedPost
+from .sharding import (author_posts, get_post_or_404, get_shards,
+                       is_sharded, shard_for_author)
+
+
+class ChainedQuerySet:
+    """Последовательное объединение выборок для Paginator.
+
+    Архивные посты всегда старше основных, поэтому сортировка
+    по дате сохраняется; следующая выборка читается, только если
+    срез выходит за пределы предыдущих.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [qs.count() for qs in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        result = []
+        for qs, count in zip(self.querysets, self.counts()):
+            if start < count and stop > 0:
+                result.extend(qs[max(start, 0):min(stop, count)])
+            start -= count
+            stop -= count
+        return result
+
+
+def archived_posts_queryset(shard):
+    if is_sharded():
+        return ArchivedPost.objects.using(shard).prefetch_related(
+            "author", "group"
+        )
+    return ArchivedPost.objects.using(shard).select_related("author", "group")
+
+
+def author_posts_with_archive(author):
+    """Все посты автора: сначала основные, затем архивные."""
+    shard = shard_for_author(author.pk)
+    return ChainedQuerySet(
+        [
+            author_posts(author),
+            archived_posts_queryset(shard).filter(author=author),
+        ]
+    )
+
+
+def get_post_with_archive_or_404(post_id):
+    try:
+        return get_post_or_404(post_id)
+    except Http404:
+        for shard in get_shards():
+            post = ArchivedPost.objects.using(shard).filter(pk=post_id).first()
+            if post is not None:
+                return post
+        raise
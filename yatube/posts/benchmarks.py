@@ -0,0 +1,231 @@
+"""Замеры производительности страниц через тестовый клиент.
+
+Каждый сценарий выполняется несколько раз; для него считаются
+перцентили времени ответа, число SQL-запросов и пик выделенной памяти.
+Запросы на запись выполняются внутри транзакции, которая откатывается,
+поэтому данные в базе не меняются.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Follow, User
+from .sharding import get_shards, sharded_posts
+
+# Наборы данных для generate_dataset по масштабу (число постов).
+SCALES = {
+    "10k": {
+        "users": 1000,
+        "groups": 20,
+        "posts": 10000,
+        "comments": 20000,
+        "follows": 5000,
+    },
+    "1m": {
+        "users": 50000,
+        "groups": 200,
+        "posts": 1000000,
+        "comments": 2000000,
+        "follows": 500000,
+    },
+    "10m": {
+        "users": 300000,
+        "groups": 1000,
+        "posts": 10000000,
+        "comments": 20000000,
+        "follows": 5000000,
+    },
+}
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(int(round(share * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def get_cases():
+    """Сценарии замеров: (имя, метод, url, данные, пользователь)."""
+    posts = sharded_posts()[0:1]
+    if not posts:
+        raise CommandError(
+            "Нет постов для замеров: сначала запустите generate_dataset "
+            "или benchmark --seed-data"
+        )
+    post = posts[0]
+    author = post.author
+    follow = Follow.objects.select_related("user").first()
+    reader = follow.user if follow else author
+    target = author
+    if target == reader:
+        target = User.objects.exclude(pk=reader.pk).first() or reader
+
+    cases = [
+        ("index", "get", reverse("posts:index"), None, None),
+        (
+            "profile",
+            "get",
+            reverse("posts:profile", args=(author.username,)),
+            None,
+            None,
+        ),
+        (
+            "post_detail",
+            "get",
+            reverse("posts:post_detail", args=(post.pk,)),
+            None,
+            reader,
+        ),
+        ("follow_index", "get", reverse("posts:follow_index"), None, reader),
+        (
+            "follow_index_merge",
+            "get",
+            reverse("posts:follow_index") + "?reader=merge",
+            None,
+            reader,
+        ),
+        (
+            "post_create",
+            "post",
+            reverse("posts:post_create"),
+            {"text": "Пост для замера"},
+            reader,
+        ),
+        (
+            "add_comment",
+            "post",
+            reverse("posts:add_comment", args=(post.pk,)),
+            {"text": "Комментарий для замера"},
+            reader,
+        ),
+        (
+            "profile_follow",
+            "get",
+            reverse("posts:profile_follow", args=(target.username,)),
+            None,
+            reader,
+        ),
+        (
+            "profile_unfollow",
+            "get",
+            reverse("posts:profile_unfollow", args=(target.username,)),
+            None,
+            reader,
+        ),
+    ]
+    if post.group_id:
+        group_url = reverse("posts:group_list", args=(post.group.slug,))
+        cases.insert(1, ("group_posts", "get", group_url, None, None))
+    return cases
+
+
+def request_once(request, url, data, trace_memory=False):
+    """Выполняет запрос в откатываемой транзакции.
+
+    Возвращает время ответа в мс, число SQL-запросов и пик памяти в КБ
+    (только при trace_memory: трассировка памяти замедляет запрос,
+    поэтому время при ней не замеряется).
+    """
+    aliases = set(get_shards()) | {"default"}
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(transaction.atomic(using=alias))
+        captured = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in aliases
+        ]
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        response = request(url, data)
+        elapsed = time.perf_counter() - started
+        peak = 0
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        for alias in aliases:
+            transaction.set_rollback(True, using=alias)
+
+    if response.status_code >= 400:
+        raise RuntimeError(f"{url}: статус {response.status_code}")
+    queries = sum(len(context) for context in captured)
+    return elapsed * 1000, queries, peak / 1024
+
+
+def run_case(method, url, data, user, iterations, warmup=1, cold=False):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    request = getattr(client, method)
+
+    for _ in range(warmup):
+        request_once(request, url, data)
+    timings, queries = [], []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        elapsed, count, _ = request_once(request, url, data)
+        timings.append(elapsed)
+        queries.append(count)
+    if cold:
+        cache.clear()
+    _, _, peak = request_once(request, url, data, trace_memory=True)
+
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": percentile(timings, 0.5),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "queries": max(queries),
+        "memory_peak_kb": peak,
+    }
+
+
+def run_benchmarks(iterations, cold=False, only=None):
+    results = {}
+    # Повторные запросы одного пользователя уперлись бы в лимиты
+    # частоты; накладные расходы лимитов видны в метриках.
+    with override_settings(RATELIMITS={}):
+        for name, method, url, data, user in get_cases():
+            if only and name not in only:
+                continue
+            results[name] = run_case(
+                method, url, data, user, iterations, cold=cold
+            )
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Сценарии, где p95 выросло больше чем в threshold раз
+    или увеличилось число запросов."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * threshold:
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']:.1f} -> "
+                f"{current['p95_ms']:.1f} мс"
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                f"{name}: запросов {previous['queries']} -> "
+                f"{current['queries']}"
+            )
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["results"]
@@ -0,0 +1,26 @@
+"""Проверки кэшей, которые сбрасываются при записи.
+
+Подписка и отписка сбрасывают кэш только в своем процессе, поэтому
+кэш в памяти процесса (LocMemCache) показывал бы другим воркерам
+устаревшие подписки.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from core.cache import is_process_local
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    if settings.FOLLOWING_CACHE and is_process_local(
+        settings.FOLLOWING_CACHE
+    ):
+        errors.append(
+            Error(
+                "FOLLOWING_CACHE указывает на кэш памяти процесса.",
+                hint="Укажите общий кэш или FOLLOWING_CACHE = None.",
+                id="posts.E001",
+            )
+        )
+    return errors
@@ -0,0 +1,93 @@
+"""События записи постов и комментариев для transactional outbox.
+
+Сигналы моделей ставят событие в outbox той базы (шарда), в которую
+записан пост, а побочные эффекты — обновление кэша ленты подписок
+и подготовка миниатюр — выполняет воркер process_outbox.
+
+Обработчики работают в процессе process_outbox, и с кэшем в памяти
+процесса воркеры сайта их изменений не видят. Поэтому процесс, который
+записал или удалил пост, после коммита сам сбрасывает в своем кэше
+время постов автора; в остальных воркерах оно истекает через
+FEED_RECENT_POSTS_TIMEOUT секунд.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from sorl.thumbnail import get_thumbnail
+
+from core import outbox
+
+from .feeds import forget_post_times, remember_post_times
+from .models import Comment, Post
+
+POST_CREATED = "post.created"
+POST_CHANGED = "post.changed"
+POST_DELETED = "post.deleted"
+COMMENT_CREATED = "comment.created"
+
+# Миниатюра, которую показывают шаблоны ленты и поста.
+THUMBNAIL_GEOMETRY = "460x339"
+THUMBNAIL_OPTIONS = {"crop": "center"}
+
+
+def forget_post_times_on_commit(post):
+    author_id = post.author_id
+    transaction.on_commit(
+        lambda: forget_post_times([author_id]), using=post._state.db
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        forget_post_times_on_commit(instance)
+    outbox.enqueue(
+        POST_CREATED if created else POST_CHANGED,
+        {
+            "post": instance.pk,
+            "author": instance.author_id,
+            "created": instance.created.timestamp(),
+            "image": instance.image.name or "",
+        },
+        using=instance._state.db,
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    forget_post_times_on_commit(instance)
+    outbox.enqueue(
+        POST_DELETED,
+        {"post": instance.pk, "author": instance.author_id},
+        using=instance._state.db,
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        outbox.enqueue(
+            COMMENT_CREATED,
+            {"comment": instance.pk, "post": instance.post_id},
+            using=instance._state.db,
+        )
+
+
+@outbox.handler(POST_CREATED)
+def update_feed_counters(events):
+    remember_post_times(
+        (event.data["author"], event.data["created"]) for event in events
+    )
+
+
+@outbox.handler(POST_DELETED)
+def reset_feed_counters(events):
+    forget_post_times({event.data["author"] for event in events})
+
+
+@outbox.handler(POST_CREATED)
+@outbox.handler(POST_CHANGED)
+def prepare_thumbnails(events):
+    for name in {event.data["image"] for event in events}:
+        if name:
+            get_thumbnail(name, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
@@ -0,0 +1,237 @@
+"""Чтение ленты подписок k-way слиянием лент авторов.
+
+Вместо одного запроса с JOIN по подпискам и сортировкой всех постов
+подписок для каждого автора читается небольшое окно его последних
+постов по индексу (author, -created), а окна сливаются кучей (heapq).
+Следующее окно автора читается, только когда предыдущее израсходовано.
+
+Курсор страницы хранит позицию каждого автора — (created, id)
+последнего показанного поста, — а у авторов, посты которых
+закончились, нулевую позицию, поэтому следующая страница продолжает
+с тех же мест и не запрашивает исчерпанных авторов. Авторы без
+позиции читаются от последнего поста страницы.
+
+Счетчик «новых с прошлого визита» сравнивает время последнего
+просмотра ленты пользователем (строка FeedVisit: его должны видеть все
+воркеры) с временем последних постов авторов. Время постов хранится
+в кэше FEED_RECENT_POSTS_TIMEOUT секунд, поэтому опрос счетчика читает
+из базы только время визита. Кэш времени постов обновляют обработчики
+событий outbox (posts.events).
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .following import followed_author_ids
+from .models import FeedVisit, Post
+from .sharding import posts_queryset, shards_for_authors
+
+RECENT_POSTS_CACHE_KEY = "recent_posts:{}"
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+BOUNDARY = "*"
+EXHAUSTED = 0
+
+
+def encode_position(post):
+    return [(post.created - EPOCH) // timedelta(microseconds=1), post.pk]
+
+
+def decode_position(value):
+    if value == EXHAUSTED:
+        return EXHAUSTED
+    microseconds, pk = value
+    return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+
+
+def encode_cursor(positions):
+    data = json.dumps(positions, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Позиции из курсора; испорченный курсор — первая страница."""
+    if not cursor:
+        return {}
+    try:
+        data = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+        return {key: decode_position(value) for key, value in data.items()}
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return {}
+
+
+class AuthorTimeline:
+    """Посты одного автора от позиции вниз, окнами по window."""
+
+    def __init__(self, queryset, author_id, position, window):
+        self.queryset = queryset.filter(author_id=author_id)
+        self.author_id = author_id
+        self.position = position
+        self.window = window
+        self.exhausted = False
+
+    def __iter__(self):
+        position = self.position
+        while True:
+            posts = self.queryset
+            if position:
+                created, pk = position
+                posts = posts.filter(
+                    Q(created__lt=created) | Q(created=created, pk__lt=pk)
+                )
+            window = list(posts.order_by("-created", "-pk")[:self.window])
+            yield from window
+            if len(window) < self.window:
+                self.exhausted = True
+                return
+            position = window[-1].created, window[-1].pk
+
+
+class CursorPage:
+    """Страница ленты для шаблона: посты и курсор следующей страницы."""
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def has_other_pages(self):
+        return bool(self.cursor or self.next_cursor)
+
+
+def merged_feed_page(user, cursor, per_page, window=None):
+    """Страница ленты подписок, собранная слиянием лент авторов."""
+    window = window or settings.FEED_MERGE_WINDOW
+    positions = decode_cursor(cursor)
+    boundary = positions.get(BOUNDARY)
+    timelines = []
+    author_ids = followed_author_ids(user)
+    for shard, ids in shards_for_authors(author_ids).items():
+        queryset = posts_queryset(shard)
+        for author_id in ids:
+            position = positions.get(str(author_id), boundary)
+            if position != EXHAUSTED:
+                timelines.append(
+                    AuthorTimeline(queryset, author_id, position, window)
+                )
+
+    merged = heapq.merge(
+        *timelines,
+        key=lambda post: (post.created, post.pk),
+        reverse=True,
+    )
+    posts = list(islice(merged, per_page))
+    if not posts or next(merged, None) is None:
+        return CursorPage(posts, cursor, None)
+
+    next_positions = {BOUNDARY: encode_position(posts[-1])}
+    for post in posts:
+        next_positions[str(post.author_id)] = encode_position(post)
+    for timeline in timelines:
+        if timeline.exhausted:
+            next_positions[str(timeline.author_id)] = EXHAUSTED
+    for author_id, position in positions.items():
+        if position == EXHAUSTED:
+            next_positions[author_id] = EXHAUSTED
+    return CursorPage(posts, cursor, encode_cursor(next_positions))
+
+
+def mark_feed_visited(user):
+    """Запоминает время просмотра ленты подписок пользователем."""
+    FeedVisit.objects.update_or_create(
+        user=user, defaults={"visited": timezone.now()}
+    )
+
+
+def recent_post_times(author_ids):
+    """Время последних FEED_RECENT_POSTS постов каждого автора
+    (по убыванию); промахи кэша дочитываются из шарда автора."""
+    keys = {RECENT_POSTS_CACHE_KEY.format(pk): pk for pk in author_ids}
+    found = {keys[key]: times for key, times in cache.get_many(keys).items()}
+    missing = [pk for pk in author_ids if pk not in found]
+    if missing:
+        limit = settings.FEED_RECENT_POSTS
+        loaded = {}
+        for shard, ids in shards_for_authors(missing).items():
+            posts = Post.objects.using(shard).order_by("-created")
+            for author_id in ids:
+                loaded[author_id] = [
+                    created.timestamp()
+                    for created in posts.filter(
+                        author_id=author_id
+                    ).values_list("created", flat=True)[:limit]
+                ]
+        cache.set_many(
+            {
+                RECENT_POSTS_CACHE_KEY.format(pk): times
+                for pk, times in loaded.items()
+            },
+            settings.FEED_RECENT_POSTS_TIMEOUT,
+        )
+        found.update(loaded)
+    return found
+
+
+def new_posts_count(user):
+    """Сколько постов авторов из подписок вышло с прошлого визита.
+
+    Возвращает (число, время визита); у каждого автора считается
+    не больше FEED_RECENT_POSTS постов.
+    """
+    visited = (
+        FeedVisit.objects.filter(user=user)
+        .values_list("visited", flat=True)
+        .first()
+    )
+    if visited is None:
+        return 0, None
+    visited = visited.timestamp()
+    author_ids = followed_author_ids(user)
+    count = sum(
+        sum(1 for created in times if created > visited)
+        for times in recent_post_times(author_ids).values()
+    )
+    return count, visited
+
+
+def remember_post_times(posts):
+    """Добавляет время новых постов в кэш авторов; posts — пары
+    (id автора, время поста). Повторное добавление ничего не меняет."""
+    by_author = {}
+    for author_id, created in posts:
+        by_author.setdefault(author_id, set()).add(created)
+    keys = {RECENT_POSTS_CACHE_KEY.format(pk): pk for pk in by_author}
+    cached = cache.get_many(keys)
+    cache.set_many(
+        {
+            key: sorted(set(times) | by_author[keys[key]], reverse=True)[
+                :settings.FEED_RECENT_POSTS
+            ]
+            for key, times in cached.items()
+        },
+        settings.FEED_RECENT_POSTS_TIMEOUT,
+    )
+
+
+def forget_post_times(author_ids):
+    cache.delete_many(
+        [RECENT_POSTS_CACHE_KEY.format(pk) for pk in author_ids]
+    )
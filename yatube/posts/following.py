@@ -0,0 +1,107 @@
+"""Множество авторов, на которых подписан пользователь.
+
+Множество загружается одним запросом или одним чтением кэша, хранится
+на объекте пользователя до конца запроса и сбрасывается при любом
+изменении подписок, поэтому проверка «подписан ли» стоит O(1).
+Между запросами множество хранится только в общем кэше FOLLOWING_CACHE.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Follow, User
+
+FOLLOWING_CACHE_KEY = "following:{}"
+
+
+def following_cache():
+    alias = settings.FOLLOWING_CACHE
+    return caches[alias] if alias else None
+
+
+def followed_author_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, "_followed_author_ids", None)
+    if ids is None:
+        cache = following_cache()
+        key = FOLLOWING_CACHE_KEY.format(user.pk)
+        ids = cache.get(key) if cache is not None else None
+        if ids is None:
+            ids = frozenset(
+                Follow.objects.filter(user=user).values_list(
+                    "author_id", flat=True
+                )
+            )
+            if cache is not None:
+                cache.set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+        user._followed_author_ids = ids
+    return ids
+
+
+def invalidate_following(*user_ids):
+    """Сбрасывает кэш подписок; нужно вызывать после bulk-операций,
+    которые не отправляют сигналы."""
+    cache = following_cache()
+    if cache is not None:
+        cache.delete_many(
+            [FOLLOWING_CACHE_KEY.format(pk) for pk in user_ids]
+        )
+
+
+def bulk_follow(user, usernames, mode):
+    """Подписывает пользователя на авторов, отписывает от них
+    или заменяет список подписок целиком (mode: follow, unfollow, set).
+
+    Авторы ищутся одним запросом, изменения применяются одной
+    транзакцией. Возвращает имена добавленных и удаленных авторов
+    и имена, которые пропущены (не найдены или сам пользователь).
+    """
+    authors = dict(
+        User.objects.filter(username__in=usernames)
+        .exclude(pk=user.pk)
+        .values_list("pk", "username")
+    )
+    follows = Follow.objects.filter(user=user)
+    with transaction.atomic():
+        if mode != "set":
+            follows = follows.filter(author_id__in=authors)
+        current = set(follows.values_list("author_id", flat=True))
+        if mode == "follow":
+            added, removed = set(authors) - current, set()
+        elif mode == "unfollow":
+            added, removed = set(), current
+        else:
+            added, removed = set(authors) - current, current - set(authors)
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=pk) for pk in added],
+            ignore_conflicts=True,
+        )
+        if removed:
+            Follow.objects.filter(user=user, author_id__in=removed).delete()
+    invalidate_following(user.pk)
+    if hasattr(user, "_followed_author_ids"):
+        del user._followed_author_ids
+
+    removed_names = dict(
+        User.objects.filter(pk__in=removed - set(authors)).values_list(
+            "pk", "username"
+        )
+    )
+    removed_names.update(authors)
+    return {
+        "followed": sorted(authors[pk] for pk in added),
+        "unfollowed": sorted(removed_names[pk] for pk in removed),
+        "skipped": sorted(set(usernames) - set(authors.values())),
+    }
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_following(instance.user_id)
+    user = instance._state.fields_cache.get("user")
+    if user is not None and hasattr(user, "_followed_author_ids"):
+        del user._followed_author_ids
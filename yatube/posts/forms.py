@@ -1,4 +1,7 @@
+import re
+
 from django import forms
+from django.conf import settings
 
 from .models import Post, Comment
 
@@ -38,3 +41,31 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст нового комментария',
         }
+
+
+class BulkFollowForm(forms.Form):
+    MODES = (
+        ('follow', 'Подписаться'),
+        ('unfollow', 'Отписаться'),
+        ('set', 'Заменить подписки'),
+    )
+
+    usernames = forms.CharField(
+        label='Авторы',
+        required=False,
+        widget=forms.Textarea,
+        help_text='Имена пользователей через пробел или запятую',
+    )
+    mode = forms.ChoiceField(label='Действие', choices=MODES)
+
+    def clean_usernames(self):
+        usernames = set(
+            re.split(r'[\s,]+', self.cleaned_data['usernames'].strip())
+        )
+        usernames.discard('')
+        limit = settings.BULK_FOLLOW_LIMIT
+        if len(usernames) > limit:
+            raise forms.ValidationError(
+                f'За один запрос можно передать не больше {limit} имен'
+            )
+        return usernames
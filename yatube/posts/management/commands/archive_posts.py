@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.utils import keep_created
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post
+from posts.sharding import get_shards
+
+POST_FIELDS = ("id", "text", "author_id", "group_id", "image", "created")
+COMMENT_FIELDS = ("id", "post_id", "author_id", "text", "created")
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты старше заданного числа дней вместе "
+        "с комментариями в архивные таблицы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        total = 0
+        for shard in get_shards():
+            while True:
+                moved = self.archive_batch(
+                    shard, cutoff, options["batch_size"]
+                )
+                if not moved:
+                    break
+                total += moved
+        self.stdout.write(
+            self.style.SUCCESS(f"Перенесено в архив постов: {total}")
+        )
+
+    def archive_batch(self, shard, cutoff, batch_size):
+        with transaction.atomic(using=shard):
+            posts = list(
+                Post.objects.using(shard)
+                .filter(created__lt=cutoff)
+                .order_by("pk")
+                .values(*POST_FIELDS)[:batch_size]
+            )
+            if not posts:
+                return 0
+            ids = [post["id"] for post in posts]
+            comments = Comment.objects.using(shard).filter(post_id__in=ids)
+
+            with keep_created(ArchivedPost, ArchivedComment):
+                ArchivedPost.objects.using(shard).bulk_create(
+                    ArchivedPost(**post) for post in posts
+                )
+                ArchivedComment.objects.using(shard).bulk_create(
+                    ArchivedComment(**comment)
+                    for comment in comments.values(*COMMENT_FIELDS)
+                )
+            comments.delete()
+            Post.objects.using(shard).filter(pk__in=ids).delete()
+        return len(posts)
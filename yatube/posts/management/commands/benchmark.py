@@ -0,0 +1,90 @@
+import json
+import platform
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.benchmarks import (SCALES, find_regressions, load_results,
+                              run_benchmarks)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время ответа, число SQL-запросов и пик памяти "
+        "для основных страниц и сохраняет результат в JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            choices=SCALES,
+            default="10k",
+            help="Метка масштаба данных в отчете.",
+        )
+        parser.add_argument(
+            "--seed-data",
+            action="store_true",
+            help="Сначала сгенерировать данные выбранного масштаба.",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кэш перед каждым запросом.",
+        )
+        parser.add_argument(
+            "--only", nargs="*", help="Замерить только эти сценарии."
+        )
+        parser.add_argument("--output", help="Файл для отчета в JSON.")
+        parser.add_argument(
+            "--compare", help="Отчет прошлого запуска для сравнения."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.2,
+            help="Во сколько раз может вырасти p95 без регрессии.",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed_data"]:
+            call_command(
+                "generate_dataset", stdout=self.stdout,
+                **SCALES[options["scale"]]
+            )
+
+        results = run_benchmarks(
+            options["iterations"], cold=options["cold"], only=options["only"]
+        )
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<18} p50 {stats['p50_ms']:8.1f} мс  "
+                f"p95 {stats['p95_ms']:8.1f} мс  "
+                f"p99 {stats['p99_ms']:8.1f} мс  "
+                f"запросов {stats['queries']:3}  "
+                f"память {stats['memory_peak_kb']:8.0f} КБ"
+            )
+
+        if options["output"]:
+            report = {
+                "scale": options["scale"],
+                "created": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+        if options["compare"]:
+            regressions = find_regressions(
+                results, load_results(options["compare"]),
+                options["threshold"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Регрессии производительности:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
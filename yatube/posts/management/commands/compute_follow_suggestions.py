@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рекомендации «на кого подписаться» "
+        "по графу подписок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Сколько рекомендаций хранить на пользователя.",
+        )
+        parser.add_argument(
+            "--max-neighbors",
+            type=int,
+            default=50,
+            help="Сколько соседей вершины графа просматривать.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = compute_suggestions(
+            limit=options["top"],
+            max_neighbors=options["max_neighbors"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Сохранено рекомендаций: {total}")
+        )
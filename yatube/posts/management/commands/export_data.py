@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exports import EXPORTS, FORMATS, export_querysets, export_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково выгружает посты, комментарии или подписки "
+        "в CSV или JSONL, при необходимости со сжатием gzip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--format", dest="fmt", choices=sorted(FORMATS), default="csv"
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument(
+            "--output", default="-", help="Файл; «-» — стандартный вывод."
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="LOOKUP=VALUE",
+            help="Фильтр выборки, например created__gte=2024-01-01.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options["filter"]:
+            lookup, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Фильтр без значения: {item}")
+            filters[lookup] = value
+
+        stream = export_stream(
+            options["name"],
+            export_querysets(options["name"], filters),
+            options["fmt"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"] == "-":
+            # Выгрузка двоичная (gzip), поэтому пишется в буфер stdout
+            # процесса, а не в текстовый self.stdout.
+            output = sys.stdout.buffer
+            for chunk in stream:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options["output"], "wb") as file:
+            for chunk in stream:
+                file.write(chunk)
+        self.stderr.write(f"Выгрузка сохранена в {options['output']}")
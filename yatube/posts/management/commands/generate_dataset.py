@@ -0,0 +1,296 @@
+import os
+import random
+import sqlite3
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from core.utils import keep_created
+from posts.models import Comment, Follow, Group, Post, User
+from posts.sharding import (get_shards, reserve_ids, shards_for_authors,
+                            sync_sequences)
+
+# Доля постов, опубликованных «всплесками» активности.
+BURST_SHARE = 0.7
+
+
+def power_law_index(rng, size, skew):
+    """Индекс от 0 до size - 1 с распределением, близким к Zipf.
+
+    Обратная функция распределения степенного закона считается
+    аналитически, поэтому память не зависит от size.
+    """
+    if skew == 1:
+        # Предел общей формулы при skew -> 1.
+        rank = size ** rng.random()
+        return min(int(rank) - 1, size - 1)
+    low = size ** (1 - skew)
+    rank = ((low - 1) * rng.random() + 1) ** (1 / (1 - skew))
+    return min(int(rank) - 1, size - 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические данные для нагрузочного тестирования: "
+        "пользователей, группы, посты, комментарии, подписки и картинки "
+        "со степенным распределением популярности и «всплесками» постов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=20000)
+        parser.add_argument("--follows", type=int, default=5000)
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=0,
+            help="Сколько разных картинок сгенерировать для постов.",
+        )
+        parser.add_argument(
+            "--image-ratio",
+            type=float,
+            default=0.1,
+            help="Доля постов с картинкой.",
+        )
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.3,
+            help="Показатель степенного закона популярности авторов.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--snapshot",
+            help="Сохранить получившуюся базу SQLite в файл.",
+        )
+        parser.add_argument(
+            "--restore",
+            help="Загрузить базу SQLite из снимка вместо генерации.",
+        )
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            self.copy_databases(options["restore"], restore=True)
+            self.stdout.write(self.style.SUCCESS("Снимок загружен"))
+            return
+
+        self.rng = random.Random(options["seed"])
+        fake = Faker("ru_RU")
+        fake.seed_instance(options["seed"])
+        self.words = fake.words(2000)
+        self.first_names = [fake.first_name() for _ in range(200)]
+        self.last_names = [fake.last_name() for _ in range(200)]
+        self.batch_size = options["batch_size"]
+        self.skew = options["skew"]
+        self.now = timezone.now()
+
+        users = self.create_users(options["users"])
+        if not users:
+            users = list(User.objects.values_list("pk", flat=True))
+        groups = self.create_groups(options["groups"])
+        images = self.create_images(options["images"])
+        if users:
+            self.create_posts(options, users, groups, images)
+            self.create_follows(options["follows"], users)
+        sync_sequences(User, Group, Post, Comment)
+
+        if options["snapshot"]:
+            self.copy_databases(options["snapshot"], restore=False)
+        self.stdout.write(self.style.SUCCESS("Данные сгенерированы"))
+
+    def text(self, low, high):
+        words = self.rng.choices(self.words, k=self.rng.randint(low, high))
+        return " ".join(words)
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def create_users(self, total):
+        if not total:
+            return None
+        first = reserve_ids(User, total)
+        password = make_password("password")
+        for start, size in self.batches(total):
+            User.objects.bulk_create(
+                User(
+                    pk=first + start + number,
+                    username=f"user{first + start + number}",
+                    first_name=self.rng.choice(self.first_names),
+                    last_name=self.rng.choice(self.last_names),
+                    password=password,
+                )
+                for number in range(size)
+            )
+        return range(first, first + total)
+
+    def create_groups(self, total):
+        if not total:
+            return list(Group.objects.values_list("pk", flat=True))
+        first = reserve_ids(Group, total)
+        Group.objects.bulk_create(
+            Group(
+                pk=first + number,
+                title=self.text(1, 3).capitalize(),
+                slug=f"group-{first + number}",
+                description=self.text(5, 20),
+            )
+            for number in range(total)
+        )
+        return range(first, first + total)
+
+    def create_images(self, total):
+        """Создает несколько картинок, которые переиспользуются постами."""
+        names = []
+        directory = os.path.join(settings.MEDIA_ROOT, "posts")
+        os.makedirs(directory, exist_ok=True)
+        for number in range(total):
+            name = f"posts/synthetic_{number}.png"
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            Image.new("RGB", (460, 339), color).save(
+                os.path.join(settings.MEDIA_ROOT, name)
+            )
+            names.append(name)
+        return names
+
+    def created(self, days, bursts):
+        """Дата поста: чаще всего рядом с одним из «всплесков»."""
+        if self.rng.random() < BURST_SHARE:
+            offset = self.rng.choice(bursts) + self.rng.expovariate(1 / 3600)
+        else:
+            offset = self.rng.random() * days * 86400
+        return self.now - timedelta(seconds=min(offset, days * 86400))
+
+    def create_posts(self, options, users, groups, images):
+        total = options["posts"]
+        days = options["days"]
+        bursts = [
+            self.rng.random() * days * 86400 for _ in range(max(days // 7, 1))
+        ]
+        post_id = reserve_ids(Post, total)
+        comment_id = reserve_ids(Comment, options["comments"])
+
+        for start, size in self.batches(total):
+            posts = []
+            for _ in range(size):
+                group = None
+                if groups and self.rng.random() < 0.7:
+                    group = groups[
+                        power_law_index(self.rng, len(groups), self.skew)
+                    ]
+                image = ""
+                if images and self.rng.random() < options["image_ratio"]:
+                    image = self.rng.choice(images)
+                posts.append(
+                    Post(
+                        pk=post_id,
+                        text=self.text(10, 80),
+                        author_id=users[
+                            power_law_index(self.rng, len(users), self.skew)
+                        ],
+                        group_id=group,
+                        image=image,
+                        created=self.created(days, bursts),
+                    )
+                )
+                post_id += 1
+
+            comments = []
+            # Комментарии распределяются по пачкам пропорционально постам.
+            batch_comments = (
+                options["comments"] * (start + size) // total
+                - options["comments"] * start // total
+            )
+            for _ in range(batch_comments):
+                post = posts[power_law_index(self.rng, size, self.skew)]
+                delay = timedelta(seconds=self.rng.expovariate(1 / 86400))
+                comments.append(
+                    Comment(
+                        pk=comment_id,
+                        post=post,
+                        author_id=self.rng.choice(users),
+                        text=self.text(3, 30),
+                        created=min(post.created + delay, self.now),
+                    )
+                )
+                comment_id += 1
+            self.save_posts(posts, comments)
+
+    def save_posts(self, posts, comments):
+        """Сохраняет пачку постов и комментариев в шарды их авторов."""
+        by_shard = shards_for_authors({post.author_id for post in posts})
+        shard_of = {
+            author: shard
+            for shard, authors in by_shard.items()
+            for author in authors
+        }
+        for shard in by_shard:
+            with transaction.atomic(using=shard), keep_created(Post, Comment):
+                Post.objects.using(shard).bulk_create(
+                    post for post in posts if shard_of[post.author_id] == shard
+                )
+                Comment.objects.using(shard).bulk_create(
+                    comment
+                    for comment in comments
+                    if shard_of[comment.post.author_id] == shard
+                )
+
+    def create_follows(self, total, users):
+        """Подписки: на популярных авторов подписываются чаще."""
+        for _, size in self.batches(total):
+            pairs = set()
+            for _ in range(size):
+                user = self.rng.choice(users)
+                index = power_law_index(self.rng, len(users), self.skew)
+                if user != users[index]:
+                    pairs.add((user, users[index]))
+            follows = [
+                Follow(
+                    user_id=user,
+                    author_id=author,
+                    created=self.now
+                    - timedelta(seconds=self.rng.random() * 86400 * 30),
+                )
+                for user, author in sorted(pairs)
+            ]
+            with keep_created(Follow):
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+    def copy_databases(self, path, restore):
+        """Снимок баз SQLite через backup API: основная база сохраняется
+        в path, шарды — в path.<alias>."""
+        targets = {
+            alias: path if alias == DEFAULT_DB_ALIAS else f"{path}.{alias}"
+            for alias in get_shards()
+        }
+        for alias, target in targets.items():
+            if connections[alias].vendor != "sqlite":
+                raise CommandError("Снимки поддерживаются только для SQLite")
+            # sqlite3.connect создал бы пустой файл, и восстановление
+            # затерло бы им базу.
+            if restore and not os.path.isfile(target):
+                raise CommandError(f"Нет файла снимка: {target}")
+        for alias, target in targets.items():
+            connection = connections[alias]
+            connection.ensure_connection()
+            if restore:
+                snapshot = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+            else:
+                snapshot = sqlite3.connect(target)
+            try:
+                if restore:
+                    snapshot.backup(connection.connection)
+                else:
+                    connection.connection.backup(snapshot)
+            finally:
+                snapshot.close()
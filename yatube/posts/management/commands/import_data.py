@@ -0,0 +1,355 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.utils import keep_created
+from posts.exports import EXPORTS
+from posts.feeds import forget_post_times
+from posts.following import invalidate_following
+from posts.models import (Comment, Follow, Group, ImportCheckpoint, Post,
+                          User)
+from posts.sharding import (get_shards, is_sharded, reserve_ids,
+                            shards_for_authors, sync_sequences)
+
+# Сколько имен пользователей держать в памяти между пачками.
+USER_CACHE_SIZE = 100000
+
+
+def open_records(path, fmt):
+    """Записи файла по одной: словари из JSONL или CSV (можно .gz)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        if fmt == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_created(value):
+    created = parse_datetime(value) if value else None
+    if created is None:
+        return timezone.now()
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created)
+    return created
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует посты, комментарии или подписки из JSONL или CSV "
+        "(формат export_data) пачками через bulk_create; прерванный "
+        "импорт продолжается с контрольной точки, которая хранится "
+        "в каждой базе вместе с записями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(EXPORTS))
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            dest="fmt",
+            choices=("csv", "jsonl"),
+            help="По умолчанию — по расширению файла.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help="Имя контрольной точки; по умолчанию по имени выгрузки "
+            "и полному пути файла.",
+        )
+        parser.add_argument(
+            "--keep-ids",
+            action="store_true",
+            help="Сохранить id постов из файла; уже существующие "
+            "посты пропускаются.",
+        )
+        parser.add_argument(
+            "--create-users",
+            action="store_true",
+            help="Создавать неизвестных авторов без пароля.",
+        )
+        parser.add_argument(
+            "--images-dir",
+            help="Каталог с картинками постов: файлы копируются "
+            "в MEDIA_ROOT. Без него имена картинок сохраняются как есть.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["fmt"] or (
+            "csv" if ".csv" in os.path.basename(path) else "jsonl"
+        )
+        self.options = options
+        self.users = {}
+        self.groups = {}
+        self.authors = set()
+        self.followers = set()
+        self.unusable_password = make_password(None)
+        model = EXPORTS[options["name"]].model
+        self.databases = (
+            get_shards() if model in (Post, Comment) else [DEFAULT_DB_ALIAS]
+        )
+        self.key = options["checkpoint"] or "{}:{}".format(
+            options["name"],
+            hashlib.sha1(os.path.abspath(path).encode()).hexdigest(),
+        )
+        self.checkpoints = self.load_checkpoints()
+        position = min(self.checkpoints.values())
+        if position:
+            self.stdout.write(f"Продолжаем с записи {position}")
+
+        importer = getattr(self, f"import_{options['name']}")
+        records = islice(open_records(path, fmt), position, None)
+        imported = skipped = 0
+        while True:
+            batch = list(islice(records, options["batch_size"]))
+            if not batch:
+                break
+            count = importer(batch, position)
+            imported += count
+            skipped += len(batch) - count
+            position += len(batch)
+
+        self.rebuild(options["name"])
+        for alias in self.databases:
+            ImportCheckpoint.objects.using(alias).filter(key=self.key).delete()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импортировано: {imported}, пропущено: {skipped}"
+            )
+        )
+
+    def load_checkpoints(self):
+        """Позиции импорта по базам; 0 — база еще ничего не получила."""
+        checkpoints = {}
+        for alias in self.databases:
+            checkpoint = (
+                ImportCheckpoint.objects.using(alias)
+                .filter(key=self.key)
+                .first()
+            )
+            checkpoints[alias] = checkpoint.position if checkpoint else 0
+        return checkpoints
+
+    def save(self, model, rows, end, **kwargs):
+        """Записывает пачку по базам вместе с контрольной точкой.
+
+        rows — тройки (номер записи в файле, база, объект). В базу идут
+        только записи после ее контрольной точки: пачка, прерванная
+        между базами, при продолжении не задваивается.
+        """
+        for alias in self.databases:
+            objects = [
+                obj
+                for index, db, obj in rows
+                if db == alias and index >= self.checkpoints[alias]
+            ]
+            with transaction.atomic(using=alias), keep_created(model):
+                model.objects.using(alias).bulk_create(objects, **kwargs)
+                checkpoints = ImportCheckpoint.objects.using(alias)
+                if not checkpoints.filter(key=self.key).update(position=end):
+                    checkpoints.create(key=self.key, position=end)
+            self.checkpoints[alias] = end
+
+    def resolve_users(self, usernames):
+        """Id пользователей по именам: из памяти, остальные одним
+        запросом; неизвестные создаются при --create-users."""
+        missing = {name for name in usernames if name} - self.users.keys()
+        if not missing:
+            return
+        if len(self.users) + len(missing) > USER_CACHE_SIZE:
+            self.users.clear()
+        self.users.update(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(username__in=missing)
+            .values_list("username", "pk")
+        )
+        unknown = sorted(missing - self.users.keys())
+        if unknown and self.options["create_users"]:
+            first = reserve_ids(User, len(unknown))
+            User.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+                User(
+                    pk=first + number,
+                    username=name,
+                    password=self.unusable_password,
+                )
+                for number, name in enumerate(unknown)
+            )
+            self.users.update(
+                (name, first + number) for number, name in enumerate(unknown)
+            )
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug} - self.groups.keys()
+        if missing:
+            found = dict(
+                Group.objects.using(DEFAULT_DB_ALIAS)
+                .filter(slug__in=missing)
+                .values_list("slug", "pk")
+            )
+            # Неизвестные группы запоминаются, чтобы не искать их снова.
+            self.groups.update({slug: found.get(slug) for slug in missing})
+
+    def attach_image(self, name):
+        directory = self.options["images_dir"]
+        if not name or not directory:
+            return name or ""
+        source = os.path.join(directory, name)
+        if not os.path.isfile(source):
+            return ""
+        with open(source, "rb") as file:
+            return default_storage.save(
+                f"posts/{os.path.basename(name)}", File(file)
+            )
+
+    def import_posts(self, records, start):
+        self.resolve_users(record.get("author") for record in records)
+        self.resolve_groups(record.get("group") for record in records)
+        posts = []
+        for index, record in enumerate(records, start):
+            author_id = self.users.get(record.get("author"))
+            pk = None
+            if self.options["keep_ids"]:
+                pk = parse_id(record.get("id"))
+            if author_id is None or not record.get("text"):
+                continue
+            post = Post(
+                pk=pk,
+                text=record["text"],
+                author_id=author_id,
+                group_id=self.groups.get(record.get("group")),
+                created=parse_created(record.get("created")),
+            )
+            posts.append((index, record, post))
+
+        by_shard = shards_for_authors(
+            {post.author_id for _, _, post in posts}
+        )
+        shard_of = {
+            author: shard
+            for shard, authors in by_shard.items()
+            for author in authors
+        }
+        # Записи до контрольной точки шарда уже импортированы: save их
+        # пропустит, и картинки для них копировать не нужно.
+        rows = []
+        for index, record, post in posts:
+            shard = shard_of[post.author_id]
+            if index < self.checkpoints[shard]:
+                continue
+            post.image = self.attach_image(record.get("image"))
+            rows.append((index, shard, post))
+        if is_sharded() and not self.options["keep_ids"] and rows:
+            first = reserve_ids(Post, len(rows))
+            for number, (_, _, post) in enumerate(rows):
+                post.pk = first + number
+
+        self.save(
+            Post,
+            rows,
+            start + len(records),
+            ignore_conflicts=self.options["keep_ids"],
+        )
+        self.authors.update(shard_of)
+        return len(posts)
+
+    def import_comments(self, records, start):
+        self.resolve_users(record.get("author") for record in records)
+        post_ids = [parse_id(record.get("post")) for record in records]
+        # Комментарий пишется в шард своего поста.
+        post_shards = {}
+        for shard in get_shards():
+            post_shards.update(
+                (pk, shard)
+                for pk in Post.objects.using(shard)
+                .filter(pk__in=set(post_ids) - {None})
+                .values_list("pk", flat=True)
+            )
+
+        comments = []
+        for index, (record, post_id) in enumerate(
+            zip(records, post_ids), start
+        ):
+            author_id = self.users.get(record.get("author"))
+            if author_id is None or post_id not in post_shards:
+                continue
+            comment = Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record.get("text") or "",
+                created=parse_created(record.get("created")),
+            )
+            comments.append((index, post_shards[post_id], comment))
+        if is_sharded() and comments:
+            first = reserve_ids(Comment, len(comments))
+            for number, (_, _, comment) in enumerate(comments):
+                comment.pk = first + number
+
+        self.save(Comment, comments, start + len(records))
+        return len(comments)
+
+    def import_follows(self, records, start):
+        self.resolve_users(
+            name
+            for record in records
+            for name in (record.get("user"), record.get("author"))
+        )
+        follows = []
+        for index, record in enumerate(records, start):
+            user_id = self.users.get(record.get("user"))
+            author_id = self.users.get(record.get("author"))
+            if user_id is None or author_id is None or user_id == author_id:
+                continue
+            follow = Follow(
+                user_id=user_id,
+                author_id=author_id,
+                created=parse_created(record.get("created")),
+            )
+            follows.append((index, DEFAULT_DB_ALIAS, follow))
+        self.save(
+            Follow, follows, start + len(records), ignore_conflicts=True
+        )
+        self.followers.update(follow.user_id for _, _, follow in follows)
+        return len(follows)
+
+    def rebuild(self, name):
+        """Кэши и статистика обновляются один раз после импорта."""
+        if self.authors:
+            forget_post_times(self.authors)
+        if self.followers:
+            invalidate_following(*self.followers)
+        model = EXPORTS[name].model
+        # Пользователи и посты с --keep-ids вставлены с явными id.
+        sync_sequences(User, model)
+        databases = get_shards() if model in (Post, Comment) else [
+            DEFAULT_DB_ALIAS
+        ]
+        for alias in databases:
+            connection = connections[alias]
+            if connection.vendor not in ("sqlite", "postgresql"):
+                continue
+            # Свежая статистика нужна планировщику и оценкам числа
+            # записей в админке (core.paginator).
+            table = connection.ops.quote_name(model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {table}")
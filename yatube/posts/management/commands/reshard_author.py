@@ -0,0 +1,103 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.utils import keep_created
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post, User
+from posts.sharding import get_shards, move_author, shard_for_author
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты автора и комментарии к ним, в том числе "
+        "архивные, в другой шард, не останавливая сайт: на время "
+        "копирования изменения записей автора запрещены, затем карта "
+        "шардов переключается и, когда "
+        "истечет кэш карты в других процессах, записи удаляются "
+        "из старого шарда."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("shard")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--wait",
+            type=float,
+            help=(
+                "Сколько секунд ждать перед удалением записей из старого "
+                "шарда (по умолчанию SHARD_CACHE_TIMEOUT)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        target = options["shard"]
+        if target not in get_shards():
+            raise CommandError(f"Неизвестный шард: {target}")
+        try:
+            author = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError("Автор не найден")
+
+        source = shard_for_author(author.pk)
+        if source == target:
+            self.stdout.write(f"Автор уже в шарде {target}")
+            return
+
+        self.batch_size = options["batch_size"]
+        # Посты копируются раньше комментариев, а удаляются после них.
+        querysets = [
+            Post.objects.filter(author=author),
+            ArchivedPost.objects.filter(author=author),
+            Comment.objects.filter(post__author=author),
+            ArchivedComment.objects.filter(post__author=author),
+        ]
+
+        # Правка или удаление уже скопированной записи потерялись бы,
+        # поэтому до переключения записи автора меняться не могут.
+        move_author(author.pk, source, moving=True)
+        try:
+            for queryset in querysets:
+                self.copy(queryset, source, target)
+        except BaseException:
+            self.delete(querysets, target)
+            move_author(author.pk, source)
+            raise
+        move_author(author.pk, target)
+
+        # Новые записи уже идут в новый шард, но процессы с картой
+        # в кэше еще читают старый: удаляем копии, когда кэш истечет.
+        wait = options["wait"]
+        time.sleep(settings.SHARD_CACHE_TIMEOUT if wait is None else wait)
+        self.delete(querysets, source)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Автор {author} перенесен: {source} -> {target}"
+            )
+        )
+
+    def delete(self, querysets, shard):
+        with transaction.atomic(using=shard):
+            for queryset in reversed(querysets):
+                queryset.using(shard).delete()
+
+    def copy(self, queryset, source, target):
+        """Копирует записи пачками по возрастанию id."""
+        model = queryset.model
+        after = 0
+        while True:
+            batch = list(
+                queryset.using(source).filter(pk__gt=after).order_by("pk")[
+                    :self.batch_size
+                ]
+            )
+            if not batch:
+                return
+            with transaction.atomic(using=target), keep_created(model):
+                model.objects.using(target).bulk_create(
+                    batch, ignore_conflicts=True
+                )
+            after = batch[-1].pk
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_author_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorshard',
+            name='moving',
+            field=models.BooleanField(default=False, verbose_name='идет перенос'),
+        ),
+    ]
@@ -12,6 +12,8 @@ class Post(CreatedModel):
         on_delete=models.CASCADE,
         related_name="posts",
         verbose_name="Автор",
+        # Посты могут лежать в другой базе, чем пользователи (шардинг).
+        db_constraint=False,
     )
     group = models.ForeignKey(
         "Group",
@@ -20,6 +22,7 @@ class Post(CreatedModel):
         on_delete=models.SET_NULL,
         related_name="groups",
         verbose_name="Группа",
+        db_constraint=False,
         help_text="Группа, к которой будет относиться пост",
     )
     image = models.ImageField(
@@ -28,6 +31,8 @@ class Post(CreatedModel):
 
     class Meta:
         ordering = ("-created",)
+        # Лента автора и чтение ленты подписок слиянием (posts.feeds).
+        indexes = [models.Index(fields=["author", "-created"])]
         verbose_name = "пост"
         verbose_name_plural = "посты"
 
@@ -60,6 +65,7 @@ class Comment(CreatedModel):
         on_delete=models.CASCADE,
         related_name="comments",
         verbose_name="Автор",
+        db_constraint=False,
     )
     text = models.TextField("Текст", help_text="Текст нового комментария")
 
@@ -93,3 +99,152 @@ class Follow(CreatedModel):
 
     def __str__(self):
         return f"Пользователь {self.user}, подписался на {self.author}"
+
+
+class FeedVisit(models.Model):
+    """Когда пользователь последний раз открывал ленту подписок."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_visit",
+        verbose_name="пользователь",
+    )
+    visited = models.DateTimeField("просмотрено")
+
+    def __str__(self):
+        return f"{self.user_id}: {self.visited}"
+
+
+class ArchivedPost(CreatedModel):
+    """Пост, перенесенный в архив командой archive_posts.
+
+    Сохраняет id исходного поста, поэтому ссылки на него не меняются.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField("Текст поста")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_posts",
+        verbose_name="Автор",
+        db_constraint=False,
+    )
+    group = models.ForeignKey(
+        "Group",
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_posts",
+        verbose_name="Группа",
+        db_constraint=False,
+    )
+    image = models.ImageField(
+        upload_to="posts/", blank=True, verbose_name="Изображение"
+    )
+
+    class Meta:
+        ordering = ("-created",)
+        verbose_name = "архивный пост"
+        verbose_name_plural = "архивные посты"
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(CreatedModel):
+    """Комментарий к архивному посту."""
+
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name="comments",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_comments",
+        verbose_name="Автор",
+        db_constraint=False,
+    )
+    text = models.TextField("Текст")
+
+    class Meta:
+        ordering = ("created",)
+
+    def __str__(self):
+        return self.text
+
+
+class AuthorShard(models.Model):
+    """Шард автора, перенесенного из шарда по умолчанию."""
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shard",
+        verbose_name="автор",
+    )
+    shard = models.CharField("шард", max_length=50)
+    moving = models.BooleanField("идет перенос", default=False)
+
+    def __str__(self):
+        return f"{self.author_id} -> {self.shard}"
+
+
+class ShardSequence(models.Model):
+    """Счетчик глобально уникальных id записей в шардах."""
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция import_data в файле для одной базы (шарда).
+
+    Обновляется в одной транзакции с записями пачки, поэтому пачка,
+    уже записанная в базу, при продолжении импорта пропускается.
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.position}"
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация «на кого подписаться», рассчитанная командой
+    compute_follow_suggestions."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follow_suggestions",
+        verbose_name="пользователь",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="рекомендуемый автор",
+    )
+    score = models.FloatField("оценка")
+
+    class Meta:
+        ordering = ("-score",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow_suggestion"
+            )
+        ]
+        indexes = [models.Index(fields=["user", "-score"])]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.author_id}: {self.score:.2f}"
@@ -0,0 +1,342 @@
+"""Распределение постов и комментариев по базам (шардам) по автору.
+
+Посты автора и комментарии к ним хранятся в одном шарде. Шард автора
+определяется хешем его id; перенесенные командой reshard_author авторы
+записаны в таблице AuthorShard основной базы. Чтение берет шард из кэша
+(на SHARD_CACHE_TIMEOUT секунд, кэш может быть своим у каждого процесса),
+а запись — из таблицы, поэтому после переноса новые посты сразу идут
+в новый шард. Пока идет перенос, запись помечена moving, и сохранить
+или удалить пост автора нельзя. Пользователи,
+группы и подписки живут только в основной базе, поэтому каскадное
+удаление пользователя или группы в остальных шардах выполняется здесь же.
+"""
+import heapq
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Max
+from django.db.models.signals import pre_delete, pre_save
+from django.dispatch import receiver
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .models import (ArchivedComment, ArchivedPost, AuthorShard, Comment,
+                     Follow, Group, Post, ShardSequence, User)
+
+SHARD_CACHE_KEY = "author_shard:{}"
+
+SHARDED_MODELS = (Post, Comment, ArchivedPost, ArchivedComment)
+
+
+class AuthorMoving(PermissionDenied):
+    """Записи автора переносятся в другой шард и пока не меняются."""
+
+
+def get_shards():
+    return settings.POST_SHARDS
+
+
+def is_sharded():
+    return len(get_shards()) > 1
+
+
+def home_shard(author_id):
+    """Шард автора по умолчанию: детерминированно по хешу id."""
+    shards = get_shards()
+    return shards[zlib.crc32(str(author_id).encode()) % len(shards)]
+
+
+def shard_for_author(author_id):
+    if not is_sharded():
+        return get_shards()[0]
+    return shards_for_authors([author_id]).popitem()[0]
+
+
+def shards_for_authors(author_ids):
+    """Группирует id авторов по шардам: {шард: [id, ...]}.
+
+    Шарды берутся из кэша, промахи добираются одним запросом.
+    """
+    author_ids = list(author_ids)
+    keys = {SHARD_CACHE_KEY.format(pk): pk for pk in author_ids}
+    found = {keys[key]: shard for key, shard in cache.get_many(keys).items()}
+    missing = [pk for pk in author_ids if pk not in found]
+    if missing:
+        moved = dict(
+            AuthorShard.objects.using(DEFAULT_DB_ALIAS)
+            .filter(author_id__in=missing)
+            .values_list("author_id", "shard")
+        )
+        loaded = {pk: moved.get(pk, home_shard(pk)) for pk in missing}
+        cache.set_many(
+            {
+                SHARD_CACHE_KEY.format(pk): shard
+                for pk, shard in loaded.items()
+            },
+            settings.SHARD_CACHE_TIMEOUT,
+        )
+        found.update(loaded)
+
+    by_shard = {}
+    for pk in author_ids:
+        by_shard.setdefault(found[pk], []).append(pk)
+    return by_shard
+
+
+def move_author(author_id, shard, moving=False):
+    """Записывает шард автора в карту шардов; moving=True запрещает
+    менять записи автора до следующего вызова."""
+    AuthorShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        author_id=author_id, defaults={"shard": shard, "moving": moving}
+    )
+    cache.set(
+        SHARD_CACHE_KEY.format(author_id), shard, settings.SHARD_CACHE_TIMEOUT
+    )
+
+
+def write_shard_for_author(author_id):
+    """Шард для записи постов автора.
+
+    Карта и флаг moving читаются из базы, а не из кэша: их должны сразу
+    видеть все процессы, а не только тот, где работал reshard_author.
+    """
+    row = (
+        AuthorShard.objects.using(DEFAULT_DB_ALIAS)
+        .filter(author_id=author_id)
+        .values_list("shard", "moving")
+        .first()
+    )
+    if row is None:
+        return home_shard(author_id)
+    shard, moving = row
+    if moving:
+        raise AuthorMoving("Записи автора переносятся, попробуйте позже.")
+    return shard
+
+
+class ShardedQuerySet:
+    """Объединение упорядоченных по дате выборок из нескольких шардов.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    срез [start:stop] берет первые stop записей каждого шарда
+    и сливает их по created.
+    """
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(qs.count() for qs in self.querysets)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        merged = heapq.merge(
+            *(qs[:stop] for qs in self.querysets),
+            key=lambda post: (post.created, post.pk),
+            reverse=True,
+        )
+        return list(islice(merged, start, stop))
+
+
+def posts_queryset(shard):
+    if is_sharded():
+        # Авторы и группы лежат в основной базе,
+        # поэтому JOIN внутри шарда невозможен.
+        return Post.objects.using(shard).prefetch_related("author", "group")
+    return Post.objects.using(shard).select_related("author", "group")
+
+
+def post_comments(post):
+    if is_sharded():
+        return post.comments.prefetch_related("author")
+    return post.comments.select_related("author")
+
+
+def sharded_posts(**filters):
+    """Посты всех шардов, удовлетворяющие фильтрам."""
+    if not is_sharded():
+        return posts_queryset(DEFAULT_DB_ALIAS).filter(**filters)
+    return ShardedQuerySet(
+        [posts_queryset(shard).filter(**filters) for shard in get_shards()]
+    )
+
+
+def author_posts(author):
+    """Посты автора: запрос уходит только в его шард."""
+    return posts_queryset(shard_for_author(author.pk)).filter(author=author)
+
+
+def followed_posts(user):
+    """Посты авторов, на которых подписан пользователь."""
+    if not is_sharded():
+        return Post.objects.filter(author__following__user=user)
+    author_ids = Follow.objects.filter(user=user).values_list(
+        "author_id", flat=True
+    )
+    return ShardedQuerySet(
+        [
+            posts_queryset(shard).filter(author_id__in=ids)
+            for shard, ids in shards_for_authors(author_ids).items()
+        ]
+    )
+
+
+def get_post_or_404(post_id, **filters):
+    if not is_sharded():
+        return get_object_or_404(Post, pk=post_id, **filters)
+    for shard in get_shards():
+        post = Post.objects.using(shard).filter(pk=post_id, **filters).first()
+        if post is not None:
+            return post
+    raise Http404("No Post matches the given query.")
+
+
+def last_id(model):
+    shards = get_shards() if model in SHARDED_MODELS else [DEFAULT_DB_ALIAS]
+    last_ids = [
+        model._base_manager.using(shard).aggregate(last=Max("pk"))
+        for shard in shards
+    ]
+    return max(ids["last"] or 0 for ids in last_ids)
+
+
+def reserve_ids(model, count):
+    """Резервирует count подряд идущих id и возвращает первый из них.
+
+    Без шардинга id выдает сама база, поэтому резервирование сводится
+    к следующему за последним id; после вставки записей с такими id
+    нужно вызвать sync_sequences.
+    """
+    if not is_sharded() or model not in SHARDED_MODELS:
+        return last_id(model) + 1
+    name = model._meta.label
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        sequences = ShardSequence.objects.using(DEFAULT_DB_ALIAS)
+        if not sequences.filter(name=name).exists():
+            sequences.create(name=name, value=last_id(model))
+        sequences.filter(name=name).update(value=F("value") + count)
+        return sequences.get(name=name).value - count + 1
+
+
+def sync_sequences(*models):
+    """Продвигает счетчики id за записи, вставленные с явными id.
+
+    Для шардированных моделей это ShardSequence, для остальных —
+    последовательности базы (в PostgreSQL они сами не сдвигаются).
+    """
+    in_database = []
+    for model in models:
+        if not is_sharded() or model not in SHARDED_MODELS:
+            in_database.append(model)
+            continue
+        name = model._meta.label
+        last = last_id(model)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            sequences = ShardSequence.objects.using(DEFAULT_DB_ALIAS)
+            sequences.get_or_create(name=name, defaults={"value": last})
+            sequences.filter(name=name, value__lt=last).update(value=last)
+    connection = connections[DEFAULT_DB_ALIAS]
+    statements = connection.ops.sequence_reset_sql(no_style(), in_database)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def next_id(model):
+    """Глобально уникальный id для записи в шарде."""
+    return reserve_ids(model, 1)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_global_id(sender, instance, **kwargs):
+    if is_sharded() and instance.pk is None:
+        instance.pk = next_id(sender)
+
+
+@receiver(pre_delete, sender=User)
+def delete_author_rows(sender, instance, using, **kwargs):
+    """Каскад CASCADE для постов и комментариев в остальных шардах."""
+    if not is_sharded():
+        return
+    for shard in get_shards():
+        if shard == using:
+            continue
+        for model in (ArchivedComment, Comment, ArchivedPost, Post):
+            model._base_manager.using(shard).filter(
+                author_id=instance.pk
+            ).delete()
+
+
+@receiver(pre_delete, sender=Group)
+def detach_group_posts(sender, instance, using, **kwargs):
+    """Каскад SET_NULL для постов группы в остальных шардах."""
+    if not is_sharded():
+        return
+    for shard in get_shards():
+        if shard == using:
+            continue
+        for model in (ArchivedPost, Post):
+            model._base_manager.using(shard).filter(
+                group_id=instance.pk
+            ).update(group=None)
+
+
+class PostShardRouter:
+    """Направляет запросы к постам и комментариям в шард автора."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if not is_sharded() or instance is None:
+            return None
+        if model in SHARDED_MODELS:
+            if isinstance(instance, SHARDED_MODELS):
+                return instance._state.db
+            if model in (Post, ArchivedPost) and isinstance(instance, User):
+                return shard_for_author(instance.pk)
+            return None
+        db = instance._state.db
+        if db != DEFAULT_DB_ALIAS and db in get_shards():
+            # Связанные пользователи и группы читаются из основной базы.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get("instance")
+        if not is_sharded() or not isinstance(instance, SHARDED_MODELS):
+            return None
+        if not isinstance(instance, model):
+            return None
+        # Сохранение и удаление отдельных записей идут через роутер,
+        # массовые операции reshard_author и архивации — в обход него.
+        if isinstance(instance, Post):
+            return write_shard_for_author(instance.author_id)
+        if isinstance(instance, Comment) and instance._state.adding:
+            return write_shard_for_author(instance.post.author_id)
+        if not instance._state.adding:
+            return instance._state.db
+        if isinstance(instance, (Comment, ArchivedComment)):
+            return instance.post._state.db
+        return shard_for_author(instance.author_id)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
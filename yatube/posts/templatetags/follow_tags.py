@@ -0,0 +1,11 @@
+from django import template
+
+from posts.following import followed_author_ids
+
+register = template.Library()
+
+
+@register.filter
+def follows(user, author):
+    """Подписан ли пользователь на автора: {% if user|follows:author %}."""
+    return getattr(author, "pk", author) in followed_author_ids(user)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ChangelistQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        # Сессия и пользователь попадают в кэш до замеров.
+        self.client.get(reverse("admin:index"))
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(username=f"user_{number}")
+            post = Post.objects.create(
+                text=f"Пост {number}", author=user, group=self.group
+            )
+            Comment.objects.create(post=post, author=user, text="Текст")
+            Follow.objects.create(user=user, author=self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for model in ("post", "comment", "follow"):
+            url = reverse(f"admin:posts_{model}_changelist")
+            with self.subTest(model=model):
+                self.add_rows(2)
+                few, _ = self.changelist_queries(url)
+                self.add_rows(6)
+                many, response = self.changelist_queries(url)
+                self.assertEqual(few, many)
+                # Пользователи не выводятся списком <option>.
+                self.assertNotContains(response, "user_1</option>")
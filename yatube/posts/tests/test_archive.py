@@ -0,0 +1,57 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import ArchivedComment, ArchivedPost, Comment, Post, User
+
+
+class ArchivePostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="test_author")
+        cls.old_post = Post.objects.create(text="old_post", author=cls.author)
+        Comment.objects.create(
+            post=cls.old_post, author=cls.author, text="old_comment"
+        )
+        cls.new_post = Post.objects.create(text="new_post", author=cls.author)
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            created=timezone.now() - timedelta(days=400)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        call_command("archive_posts", days=365, stdout=StringIO())
+
+    def test_old_posts_moved_to_archive(self):
+        """Старые посты и комментарии перенесены в архив."""
+        self.assertFalse(Post.objects.filter(pk=self.old_post.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=self.new_post.pk).exists())
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.text, self.old_post.text)
+        self.assertEqual(
+            archived.created.date(),
+            (timezone.now() - timedelta(days=400)).date(),
+        )
+        self.assertEqual(ArchivedComment.objects.get().post, archived)
+
+    def test_post_detail_falls_through_to_archive(self):
+        response = self.client.get(
+            reverse("posts:post_detail", args=(self.old_post.pk,))
+        )
+        self.assertEqual(response.context["post"].text, "old_post")
+        self.assertTrue(response.context["is_archived"])
+        self.assertEqual(len(response.context["comments"]), 1)
+        self.assertEqual(response.context["posts_count"], 2)
+
+    def test_profile_lists_archived_posts_after_new(self):
+        response = self.client.get(
+            reverse("posts:profile", args=(self.author.username,))
+        )
+        texts = [post.text for post in response.context["page_obj"]]
+        self.assertEqual(texts, ["new_post", "old_post"])
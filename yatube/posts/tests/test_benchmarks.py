@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..benchmarks import find_regressions
+from ..models import Follow, Group, Post, User
+
+
+class BenchmarkCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="test_author")
+        cls.reader = User.objects.create_user(username="test_reader")
+        cls.group = Group.objects.create(
+            title="group_name", slug="slug-test", description="description"
+        )
+        Post.objects.create(
+            text="test_post", author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_report_covers_all_views(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "report.json")
+            call_command(
+                "benchmark", iterations=2, output=output, stdout=StringIO()
+            )
+            with open(output, encoding="utf-8") as file:
+                results = json.load(file)["results"]
+
+        self.assertEqual(
+            set(results),
+            {
+                "index",
+                "group_posts",
+                "profile",
+                "post_detail",
+                "follow_index",
+                "follow_index_merge",
+                "post_create",
+                "add_comment",
+                "profile_follow",
+                "profile_unfollow",
+            },
+        )
+        self.assertGreater(results["index"]["queries"], 0)
+        # Запросы на запись откатываются.
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_regression_detected(self):
+        baseline = {"index": {"p95_ms": 10.0, "queries": 2}}
+        results = {"index": {"p95_ms": 15.0, "queries": 3}}
+
+        self.assertEqual(len(find_regressions(results, baseline, 1.2)), 2)
+        self.assertEqual(find_regressions(baseline, baseline, 1.2), [])
+
+    def test_compare_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            with open(baseline, "w", encoding="utf-8") as file:
+                json.dump(
+                    {"results": {"index": {"p95_ms": 0.0, "queries": 0}}},
+                    file,
+                )
+            with self.assertRaises(CommandError):
+                call_command(
+                    "benchmark",
+                    iterations=1,
+                    only=["index"],
+                    compare=baseline,
+                    stdout=StringIO(),
+                )
+
+    def test_empty_database_reports_error(self):
+        Post.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, "generate_dataset"):
+            call_command("benchmark", iterations=1, stdout=StringIO())
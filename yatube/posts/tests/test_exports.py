@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f"Пост, {number}",
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text="Комментарий"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export")
+            call_command(
+                "export_data", *args, "--output", path, stderr=io.StringIO()
+            )
+            with open(path, "rb") as file:
+                return file.read()
+
+    def test_csv_export(self):
+        data = self.export("posts", "--chunk-size", "2").decode()
+        rows = list(csv.DictReader(io.StringIO(data)))
+
+        self.assertEqual(
+            [row["text"] for row in rows], [post.text for post in self.posts]
+        )
+        self.assertEqual({row["author"] for row in rows}, {"author"})
+        self.assertEqual(rows[1]["group"], "group")
+        self.assertEqual(rows[0]["group"], "")
+
+    def test_gzip_jsonl_export_with_filters(self):
+        data = self.export(
+            "follows",
+            "--format=jsonl",
+            "--gzip",
+            f"--filter=author_id={self.author.pk}",
+        )
+        lines = gzip.decompress(data).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["user"], "reader")
+        self.assertEqual(rows[0]["author"], "author")
+
+        data = self.export(
+            "comments", "--format=jsonl", f"--filter=author={self.author.pk}"
+        )
+        self.assertEqual(data, b"")
+
+    def test_admin_action_streams_selected_rows(self):
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse("admin:posts_post_changelist"),
+            {
+                "action": "export_csv_gzip",
+                "_selected_action": [post.pk for post in self.posts[:2]],
+            },
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        data = gzip.decompress(b"".join(response.streaming_content))
+        rows = list(csv.DictReader(io.StringIO(data.decode())))
+        self.assertEqual(len(rows), 2)
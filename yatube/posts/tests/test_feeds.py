@@ -0,0 +1,200 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from core.outbox import process_pending
+
+from ..feeds import (decode_cursor, encode_cursor, merged_feed_page,
+                     new_posts_count)
+from ..models import Follow, Post, User
+
+
+class MergedFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader")
+        cls.authors = [
+            User.objects.create_user(username=f"author_{number}")
+            for number in range(3)
+        ]
+        stranger = User.objects.create_user(username="stranger")
+        now = timezone.now()
+        # Посты авторов перемежаются; у author_2 всего один пост.
+        for number in range(12):
+            Post.objects.create(
+                text=f"post {number}", author=cls.authors[number % 2]
+            )
+        Post.objects.create(text="stranger", author=stranger)
+        Post.objects.create(text="single", author=cls.authors[2])
+        for number, post in enumerate(Post.objects.order_by("pk")):
+            post.created = now - timedelta(minutes=number)
+            post.save()
+        Post.objects.filter(text="single").update(
+            created=now + timedelta(minutes=1)
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def read_all(self, per_page, window):
+        pages, cursor = [], None
+        while True:
+            page = merged_feed_page(self.user, cursor, per_page, window)
+            pages.append(list(page))
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_match_join_order(self):
+        expected = list(
+            Post.objects.filter(author__following__user=self.user)
+        )
+        pages = self.read_all(per_page=5, window=2)
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 3])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_exhausted_authors_are_not_queried(self):
+        page = merged_feed_page(self.user, None, 5, window=3)
+        positions = decode_cursor(page.next_cursor)
+        self.assertEqual(positions[str(self.authors[2].pk)], 0)
+
+        # По одному окну на каждого из двух оставшихся авторов.
+        with self.assertNumQueries(2):
+            list(merged_feed_page(self.user, page.next_cursor, 5, window=5))
+
+    def test_broken_cursor_starts_from_first_page(self):
+        first = merged_feed_page(self.user, None, 5)
+        broken = merged_feed_page(self.user, "not-a-cursor", 5)
+        self.assertEqual(list(broken), list(first))
+
+    def test_out_of_range_cursor_starts_from_first_page(self):
+        for microseconds in (10 ** 20, -10 ** 20):
+            cursor = encode_cursor({"1": [microseconds, 1]})
+            self.assertEqual(decode_cursor(cursor), {})
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse("posts:follow_index"),
+            {"reader": "merge", "cursor": cursor},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_reader_selected_per_request(self):
+        client = Client()
+        client.force_login(self.user)
+        url = reverse("posts:follow_index")
+
+        response = client.get(url, {"reader": "merge"})
+        merged = list(response.context["page_obj"])
+        self.assertContains(response, "cursor=")
+        response = client.get(url)
+        self.assertEqual(list(response.context["page_obj"]), merged)
+        self.assertEqual(response.context["reader"], "join")
+
+
+class NewPostsCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+        cls.stranger = User.objects.create_user(username="stranger")
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(text="seen", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse("posts:follow_new_count")
+
+    def count(self):
+        return self.client.get(self.url).json()["count"]
+
+    def test_counts_posts_since_last_visit(self):
+        self.assertEqual(self.count(), 0)
+        self.client.get(reverse("posts:follow_index"))
+        self.assertEqual(self.count(), 0)
+
+        Post.objects.create(text="new", author=self.author)
+        Post.objects.create(text="other", author=self.stranger)
+        post = Post.objects.create(text="newer", author=self.author)
+        # Кэш времени постов обновляет воркер outbox.
+        self.assertEqual(self.count(), 0)
+        process_pending()
+        self.assertEqual(self.count(), 2)
+
+        post.delete()
+        process_pending()
+        self.assertEqual(self.count(), 1)
+        # Вторая страница ленты не сдвигает время визита.
+        self.client.get(reverse("posts:follow_index"), {"page": 2})
+        self.assertEqual(self.count(), 1)
+        self.client.get(reverse("posts:follow_index"))
+        self.assertEqual(self.count(), 0)
+
+    def test_visit_survives_cache_loss(self):
+        """Время визита хранится в базе: его видит любой воркер."""
+        self.client.get(reverse("posts:follow_index"))
+        Post.objects.create(text="new", author=self.author)
+        cache.clear()
+        self.assertEqual(self.count(), 1)
+
+    @override_settings(FOLLOWING_CACHE="default")
+    def test_polling_reads_only_visit_time(self):
+        self.client.get(reverse("posts:follow_index"))
+        self.count()
+        Post.objects.create(text="new", author=self.author)
+        process_pending()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(new_posts_count(user)[0], 1)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "core.cache.InstrumentedLocMemCache"},
+        "outbox": {
+            "BACKEND": "core.cache.InstrumentedLocMemCache",
+            "LOCATION": "outbox",
+        },
+    }
+)
+class NewPostsCountSeparateCacheTest(TransactionTestCase):
+    """Обработчики outbox и сайт работают в разных процессах,
+    каждый со своим кэшем в памяти."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader")
+        self.author = User.objects.create_user(username="author")
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+        self.client.get(reverse("posts:follow_index"))
+
+    def count(self):
+        return self.client.get(reverse("posts:follow_new_count")).json()[
+            "count"
+        ]
+
+    def process_outbox(self):
+        with mock.patch("posts.feeds.cache", caches["outbox"]):
+            process_pending()
+
+    def test_count_sees_posts_written_by_site(self):
+        self.assertEqual(self.count(), 0)
+        post = Post.objects.create(text="new", author=self.author)
+        self.process_outbox()
+        self.assertEqual(self.count(), 1)
+
+        post.delete()
+        self.process_outbox()
+        self.assertEqual(self.count(), 0)
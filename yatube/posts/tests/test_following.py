@@ -0,0 +1,174 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..checks import check_shared_cache
+from ..following import followed_author_ids
+from ..models import Follow, Post, User
+
+
+@override_settings(FOLLOWING_CACHE="default")
+class FollowedAuthorsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="test_user")
+        cls.authors = [
+            User.objects.create_user(username=f"author_{number}")
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        # Свежий объект: множество подписок хранится на пользователе.
+        self.user = User.objects.get(pk=self.user.pk)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_loaded_once_per_request_and_cached(self):
+        with self.assertNumQueries(1):
+            ids = followed_author_ids(self.user)
+            followed_author_ids(self.user)
+        self.assertEqual(ids, {self.authors[0].pk})
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            followed_author_ids(user)
+
+    @override_settings(FOLLOWING_CACHE=None)
+    def test_without_shared_cache_loaded_per_request(self):
+        followed_author_ids(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            followed_author_ids(user)
+        self.assertIsNone(cache.get(f"following:{self.user.pk}"))
+
+    def test_local_cache_rejected_by_check(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["posts.E001"]
+        )
+        with self.settings(FOLLOWING_CACHE=None):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_follow_invalidates_cache(self):
+        followed_author_ids(self.user)
+        self.client.get(
+            reverse("posts:profile_follow", args=(self.authors[1].username,))
+        )
+        user = User.objects.get(pk=self.user.pk)
+        self.assertIn(self.authors[1].pk, followed_author_ids(user))
+
+        self.client.get(
+            reverse("posts:profile_unfollow", args=(self.authors[0].username,))
+        )
+        user = User.objects.get(pk=self.user.pk)
+        self.assertNotIn(self.authors[0].pk, followed_author_ids(user))
+
+    def test_follows_filter(self):
+        template = Template(
+            "{% load follow_tags %}"
+            "{% for author in authors %}{{ user|follows:author }} "
+            "{% endfor %}"
+        )
+        with self.assertNumQueries(1):
+            rendered = template.render(
+                Context({"user": self.user, "authors": self.authors})
+            )
+        self.assertEqual(rendered, "True False False ")
+
+    def test_profile_shows_follow_state(self):
+        response = self.client.get(
+            reverse("posts:profile", args=(self.authors[0].username,))
+        )
+        self.assertTrue(response.context["following"])
+        self.assertContains(response, "Отписаться")
+
+    def test_follow_feed_shows_follow_buttons(self):
+        author = self.authors[0]
+        Post.objects.create(text="post", author=author)
+        response = self.client.get(reverse("posts:follow_index"))
+        unfollow = reverse("posts:profile_unfollow", args=(author.username,))
+        self.assertContains(response, unfollow)
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="test_user")
+        cls.authors = [
+            User.objects.create_user(username=f"author_{number}")
+            for number in range(4)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+        Follow.objects.create(user=cls.user, author=cls.authors[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post(self, mode, *usernames):
+        return self.client.post(
+            reverse("posts:follow_bulk"),
+            {"mode": mode, "usernames": usernames},
+        )
+
+    def followed(self):
+        return set(
+            Follow.objects.filter(user=self.user).values_list(
+                "author__username", flat=True
+            )
+        )
+
+    def test_follow(self):
+        response = self.post(
+            "follow", "author_1 author_2", "author_3,test_user", "nobody"
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                "followed": ["author_2", "author_3"],
+                "unfollowed": [],
+                "skipped": ["nobody", "test_user"],
+            },
+        )
+        self.assertEqual(
+            self.followed(), {"author_0", "author_1", "author_2", "author_3"}
+        )
+
+    def test_unfollow(self):
+        response = self.post("unfollow", "author_1", "author_2")
+        self.assertEqual(response.json()["unfollowed"], ["author_1"])
+        self.assertEqual(self.followed(), {"author_0"})
+
+    def test_set(self):
+        followed_author_ids(self.user)
+        response = self.post("set", "author_1 author_2")
+        self.assertEqual(
+            response.json(),
+            {
+                "followed": ["author_2"],
+                "unfollowed": ["author_0"],
+                "skipped": [],
+            },
+        )
+        self.assertEqual(self.followed(), {"author_1", "author_2"})
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(
+            followed_author_ids(user),
+            {self.authors[1].pk, self.authors[2].pk},
+        )
+
+    def test_set_empty_unfollows_all(self):
+        self.post("set")
+        self.assertEqual(self.followed(), set())
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post("bogus", "author_1").status_code, 400)
+        with self.settings(BULK_FOLLOW_LIMIT=1):
+            self.assertEqual(
+                self.post("follow", "author_1 author_2").status_code, 400
+            )
+        response = self.client.get(reverse("posts:follow_bulk"))
+        self.assertEqual(response.status_code, 405)
@@ -63,6 +63,7 @@ class PostPageTests(TestCase):
 
     @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
     def setUp(self):
+        cache.clear()
         # Авторизация пользователя
         self.authorized_client.force_login(self.author)
 
@@ -193,9 +194,9 @@ class CommentFormTest(TestCase):
 
     def setUp(self):
         super().setUp()
+        cache.clear()
         self.author_client.force_login(self.author)
         self.authorized_client.force_login(self.user)
-        cache.clear()
 
     def test_guest_cant_add_comment(self):
         """Гость не может оставлять комментарии"""
@@ -0,0 +1,82 @@
+import os
+import random
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from ..management.commands.generate_dataset import power_law_index
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetTest(TestCase):
+    options = {
+        "users": 30,
+        "groups": 3,
+        "posts": 120,
+        "comments": 70,
+        "follows": 40,
+        "images": 2,
+        "image_ratio": 0.5,
+        "seed": 7,
+        "batch_size": 50,
+        "stdout": StringIO(),
+    }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generates_requested_volume(self):
+        call_command("generate_dataset", **self.options)
+
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 70)
+        self.assertTrue(0 < Follow.objects.count() <= 40)
+        self.assertTrue(Post.objects.exclude(image="").exists())
+        self.assertFalse(
+            Follow.objects.filter(user_id=F("author_id")).exists()
+        )
+
+    def test_same_seed_gives_same_data(self):
+        call_command("generate_dataset", **self.options)
+        first = list(Post.objects.values_list("text", "author_id", "created"))
+        for model in (Follow, Comment, Post, Group, User):
+            model.objects.all().delete()
+
+        call_command("generate_dataset", **self.options)
+        second = list(Post.objects.values_list("text", "author_id", "created"))
+
+        self.assertEqual(
+            [post[:2] for post in first], [post[:2] for post in second]
+        )
+
+    def test_power_law_index_accepts_classic_zipf(self):
+        """Показатель 1 (классический Zipf) не ломает распределение."""
+        rng = random.Random(1)
+        for skew in (0.5, 1, 1.3):
+            indexes = [power_law_index(rng, 50, skew) for _ in range(500)]
+            self.assertTrue(all(0 <= index < 50 for index in indexes))
+            self.assertGreater(indexes.count(0), indexes.count(49))
+
+    def test_restore_without_snapshot_keeps_database(self):
+        """Отсутствующий снимок не затирает базу пустым файлом."""
+        call_command("generate_dataset", **self.options)
+        missing = os.path.join(TEMP_MEDIA_ROOT, "missing.sqlite3")
+
+        with self.assertRaises(CommandError):
+            call_command("generate_dataset", restore=missing)
+
+        self.assertFalse(os.path.exists(missing))
+        self.assertEqual(Post.objects.count(), 120)
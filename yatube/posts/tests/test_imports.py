@@ -0,0 +1,214 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from ..following import followed_author_ids
+from ..management.commands.import_data import Command as ImportCommand
+from ..models import Comment, Follow, Group, ImportCheckpoint, Post, User
+from ..sharding import move_author
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return path
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command("import_data", *args, stdout=out)
+        return out.getvalue()
+
+    def test_posts_import_resolves_authors_and_groups(self):
+        path = self.write_jsonl(
+            "posts.jsonl",
+            [
+                {
+                    "created": f"2021-01-0{number + 1}T10:00:00+00:00",
+                    "author": "author" if number % 2 else "newcomer",
+                    "group": "group" if number % 2 else "missing",
+                    "text": f"Пост {number}",
+                    "image": "",
+                }
+                for number in range(5)
+            ]
+            + [{"author": "author", "text": ""}],
+        )
+        with self.assertNumQueries(21):
+            output = self.run_import(
+                "posts", path, "--batch-size=2", "--create-users"
+            )
+
+        self.assertIn("Импортировано: 5, пропущено: 1", output)
+        self.assertEqual(Post.objects.count(), 5)
+        newcomer = User.objects.get(username="newcomer")
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(
+            Post.objects.filter(author=self.author, group=self.group).count(),
+            2,
+        )
+        self.assertFalse(
+            Post.objects.filter(author=newcomer, group__isnull=False).exists()
+        )
+        self.assertEqual(
+            str(Post.objects.get(text="Пост 0").created.date()), "2021-01-01"
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        path = self.write_jsonl(
+            "posts.jsonl",
+            [{"author": "author", "text": f"Пост {n}"} for n in range(4)],
+        )
+        ImportCheckpoint.objects.create(key="state", position=3)
+
+        output = self.run_import("posts", path, "--checkpoint=state")
+
+        self.assertIn("Продолжаем с записи 3", output)
+        self.assertEqual(
+            list(Post.objects.values_list("text", flat=True)), ["Пост 3"]
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_checkpoint_saved_with_batch(self):
+        """Сбой при сохранении позиции откатывает и записи пачки."""
+        path = self.write_jsonl(
+            "posts.jsonl",
+            [{"author": "author", "text": f"Пост {n}"} for n in range(4)],
+        )
+        update = QuerySet.update
+        calls = []
+
+        def fail_second_batch(queryset, **kwargs):
+            if queryset.model is ImportCheckpoint:
+                calls.append(kwargs)
+                if len(calls) == 2:
+                    raise RuntimeError("сбой")
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(
+            QuerySet, "update", autospec=True, side_effect=fail_second_batch
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import(
+                    "posts", path, "--batch-size=2", "--checkpoint=state"
+                )
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().position, 2)
+
+        self.run_import("posts", path, "--batch-size=2", "--checkpoint=state")
+        self.assertEqual(
+            sorted(Post.objects.values_list("text", flat=True)),
+            [f"Пост {n}" for n in range(4)],
+        )
+
+    def test_keep_ids_skips_existing_posts_and_links_comments(self):
+        post = Post.objects.create(text="Старый", author=self.author)
+        path = self.write_jsonl(
+            "posts.jsonl",
+            [
+                {"id": post.pk, "author": "author", "text": "Дубль"},
+                {"id": post.pk + 10, "author": "author", "text": "Новый"},
+            ],
+        )
+        self.run_import("posts", path, "--keep-ids")
+        self.assertEqual(Post.objects.get(pk=post.pk).text, "Старый")
+        self.assertEqual(Post.objects.get(pk=post.pk + 10).text, "Новый")
+
+        path = self.write_jsonl(
+            "comments.jsonl",
+            [
+                {"post": post.pk + 10, "author": "reader", "text": "Да"},
+                {"post": post.pk + 20, "author": "reader", "text": "Нет"},
+            ],
+        )
+        output = self.run_import("comments", path)
+        self.assertIn("Импортировано: 1, пропущено: 1", output)
+        self.assertEqual(
+            Comment.objects.get().post_id, post.pk + 10
+        )
+
+    def test_csv_follows_import_invalidates_following_cache(self):
+        self.assertEqual(followed_author_ids(self.reader), set())
+        path = os.path.join(self.directory, "follows.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["created", "user", "author"])
+            writer.writerow(["", "reader", "author"])
+            writer.writerow(["", "reader", "author"])
+            writer.writerow(["", "reader", "reader"])
+
+        self.run_import("follows", path)
+
+        self.assertEqual(Follow.objects.count(), 1)
+        reader = User.objects.get(pk=self.reader.pk)
+        self.assertEqual(followed_author_ids(reader), {self.author.pk})
+
+
+@override_settings(POST_SHARDS=["default", "shard1"])
+class ShardedImportTest(TestCase):
+    databases = {"default", "shard1"}
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "posts.jsonl")
+        for name, shard in (("near", "default"), ("far", "shard1")):
+            move_author(User.objects.create_user(username=name).pk, shard)
+
+    def test_resume_skips_images_of_imported_rows(self):
+        """Картинки записей до контрольной точки шарда не копируются."""
+        with open(self.path, "w", encoding="utf-8") as file:
+            for number, author in enumerate(["near", "far"] * 2):
+                row = {"author": author, "text": f"Пост {number}"}
+                row["image"] = f"{number}.jpg"
+                file.write(json.dumps(row) + "\n")
+        # Первая пачка уже записана в основную базу, но не в шард.
+        ImportCheckpoint.objects.create(key="state", position=2)
+
+        with mock.patch.object(
+            ImportCommand,
+            "attach_image",
+            autospec=True,
+            side_effect=lambda command, name: name,
+        ) as attach_image:
+            call_command(
+                "import_data",
+                "posts",
+                self.path,
+                "--batch-size=2",
+                "--checkpoint=state",
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(
+            [args[1] for args, _ in attach_image.call_args_list],
+            ["1.jpg", "2.jpg", "3.jpg"],
+        )
+        self.assertEqual(Post.objects.using("default").count(), 1)
+        self.assertEqual(Post.objects.using("shard1").count(), 2)
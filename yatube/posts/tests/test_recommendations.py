@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, User
+from ..recommendations import (FollowGraph, compute_suggestions,
+                               suggested_authors)
+
+
+class FollowSuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ("reader", "a", "b", "c", "d", "e", "other")
+        }
+        for user, author in (
+            ("reader", "a"),
+            ("reader", "b"),
+            ("a", "c"),
+            ("b", "c"),
+            ("b", "d"),
+            ("other", "a"),
+            ("other", "e"),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def suggestions(self, name):
+        return list(
+            FollowSuggestion.objects.filter(
+                user=self.users[name]
+            ).values_list("author__username", flat=True)
+        )
+
+    def test_graph_adjacency(self):
+        graph = FollowGraph.load()
+        reader, a = self.users["reader"].pk, self.users["a"].pk
+        self.assertEqual(
+            set(graph.followed_by(reader)),
+            {a, self.users["b"].pk},
+        )
+        self.assertEqual(
+            set(graph.followers_of(a)), {reader, self.users["other"].pk}
+        )
+
+    def test_friends_of_friends_rank_above_co_follows(self):
+        compute_suggestions(limit=10)
+        self.assertEqual(self.suggestions("reader"), ["c", "d", "e"])
+        self.assertEqual(self.suggestions("c"), [])
+
+    def test_recompute_replaces_old_suggestions(self):
+        FollowSuggestion.objects.create(
+            user=self.users["c"], author=self.users["a"], score=100
+        )
+        call_command(
+            "compute_follow_suggestions", "--top", "1", stdout=StringIO()
+        )
+        self.assertEqual(self.suggestions("reader"), ["c"])
+        self.assertEqual(self.suggestions("c"), [])
+
+    def test_profile_widget(self):
+        compute_suggestions()
+        client = Client()
+        client.force_login(self.users["reader"])
+        Follow.objects.create(
+            user=self.users["reader"], author=self.users["d"]
+        )
+        response = client.get(reverse("posts:profile", args=("a",)))
+        self.assertEqual(
+            [author.username for author in response.context["suggestions"]],
+            ["c", "e"],
+        )
+        self.assertContains(response, "На кого подписаться")
+
+        response = Client().get(reverse("posts:profile", args=("a",)))
+        self.assertEqual(response.context["suggestions"], [])
+
+    def test_followed_authors_do_not_shrink_widget(self):
+        compute_suggestions()
+        reader = self.users["reader"]
+        Follow.objects.create(user=reader, author=self.users["c"])
+        self.assertEqual(
+            [author.username for author in suggested_authors(reader, 2)],
+            ["d", "e"],
+        )
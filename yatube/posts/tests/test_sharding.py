@@ -0,0 +1,255 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..archive import author_posts_with_archive
+from ..management.commands.reshard_author import Command as ReshardCommand
+from ..models import (ArchivedComment, ArchivedPost, AuthorShard, Comment,
+                      Follow, Group, Post, User)
+from ..sharding import (SHARD_CACHE_KEY, AuthorMoving, ShardedQuerySet,
+                        followed_posts, get_post_or_404, home_shard,
+                        move_author, next_id, shard_for_author, sharded_posts,
+                        sync_sequences, write_shard_for_author)
+
+
+class ShardedQuerySetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username="first")
+        cls.second = User.objects.create_user(username="second")
+        for number in range(6):
+            Post.objects.create(
+                text=f"post {number}",
+                author=cls.first if number % 2 else cls.second,
+            )
+
+    def test_merge_keeps_global_order(self):
+        """Склейка выборок «шардов» совпадает с общей сортировкой."""
+        merged = ShardedQuerySet(
+            [
+                Post.objects.filter(author=self.first),
+                Post.objects.filter(author=self.second),
+            ]
+        )
+        expected = list(Post.objects.all())
+
+        self.assertEqual(merged.count(), len(expected))
+        self.assertEqual(merged[0:6], expected)
+        self.assertEqual(merged[2:5], expected[2:5])
+
+
+@override_settings(POST_SHARDS=["default", "shard1"])
+class ShardMapTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+
+    def test_home_shard_is_deterministic(self):
+        self.assertEqual(
+            shard_for_author(self.author.pk), home_shard(self.author.pk)
+        )
+
+    def test_moved_author_uses_shard_map(self):
+        other = "shard1" if home_shard(self.author.pk) == "default" else (
+            "default"
+        )
+        move_author(self.author.pk, other)
+        cache.clear()
+
+        self.assertEqual(shard_for_author(self.author.pk), other)
+        self.assertTrue(
+            AuthorShard.objects.filter(
+                author=self.author, shard=other
+            ).exists()
+        )
+
+
+@override_settings(POST_SHARDS=["default", "shard1"])
+class CrossShardTest(TestCase):
+    databases = {"default", "shard1"}
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(
+            title="group", slug="group", description="group"
+        )
+        self.near = User.objects.create_user(username="near")
+        self.far = User.objects.create_user(username="far")
+        move_author(self.near.pk, "default")
+        move_author(self.far.pk, "shard1")
+        # QuerySet.create передает базу явно, в обход роутера шардов,
+        # поэтому записи сохраняются как во views.
+        self.near_post = Post(
+            text="near post", author=self.near, group=self.group
+        )
+        self.near_post.save()
+        self.far_post = Post(
+            text="far post", author=self.far, group=self.group
+        )
+        self.far_post.save()
+        self.far_comment = Comment(
+            post=self.far_post, author=self.near, text="comment"
+        )
+        self.far_comment.save()
+
+    def test_posts_written_to_author_shard(self):
+        """Пост и комментарии к нему лежат в шарде автора поста."""
+        self.assertEqual(self.far_post._state.db, "shard1")
+        self.assertEqual(self.far_comment._state.db, "shard1")
+        self.assertFalse(
+            Post.objects.using("default").filter(author=self.far).exists()
+        )
+
+    def test_reads_gather_all_shards(self):
+        """Общие ленты, подписки и поиск поста обходят все шарды."""
+        Follow.objects.create(user=self.near, author=self.far)
+        Follow.objects.create(user=self.near, author=self.near)
+        expected = [self.far_post, self.near_post]
+
+        self.assertEqual(list(sharded_posts()[0:10]), expected)
+        self.assertEqual(
+            list(sharded_posts(group=self.group)[0:10]), expected
+        )
+        self.assertEqual(list(followed_posts(self.near)[0:10]), expected)
+        found = get_post_or_404(self.far_post.pk)
+        self.assertEqual(found._state.db, "shard1")
+
+    def test_reshard_author_moves_posts_and_comments(self):
+        """reshard_author переносит записи и переключает карту шардов."""
+
+        def wait(seconds):
+            # Пока истекает кэш карты, старая копия еще читается.
+            self.assertEqual(seconds, settings.SHARD_CACHE_TIMEOUT)
+            self.assertEqual(write_shard_for_author(self.far.pk), "default")
+            self.assertTrue(Post.objects.using("shard1").exists())
+
+        with mock.patch("time.sleep", side_effect=wait) as sleep:
+            call_command(
+                "reshard_author", "far", "default", stdout=StringIO()
+            )
+
+        sleep.assert_called_once()
+        self.assertEqual(shard_for_author(self.far.pk), "default")
+        self.assertFalse(AuthorShard.objects.get(author=self.far).moving)
+        self.assertFalse(Post.objects.using("shard1").exists())
+        self.assertFalse(Comment.objects.using("shard1").exists())
+        moved = Post.objects.using("default").get(pk=self.far_post.pk)
+        self.assertEqual(moved.text, self.far_post.text)
+        self.assertEqual(moved.created, self.far_post.created)
+        self.assertTrue(
+            Comment.objects.using("default")
+            .filter(pk=self.far_comment.pk, post=moved)
+            .exists()
+        )
+
+    def test_reshard_author_moves_archive(self):
+        """Архивные посты автора остаются в его профиле после переноса."""
+        archived = ArchivedPost.objects.using("shard1").create(
+            id=next_id(Post), text="archived", author=self.far
+        )
+        ArchivedComment.objects.using("shard1").create(
+            id=next_id(Comment), post=archived, author=self.near, text="old"
+        )
+
+        call_command(
+            "reshard_author", "far", "default", "--wait=0", stdout=StringIO()
+        )
+
+        self.assertFalse(ArchivedPost.objects.using("shard1").exists())
+        self.assertFalse(ArchivedComment.objects.using("shard1").exists())
+        self.assertEqual(
+            list(author_posts_with_archive(self.far)[0:10]),
+            [self.far_post, archived],
+        )
+        self.assertTrue(
+            ArchivedComment.objects.using("default")
+            .filter(post=archived)
+            .exists()
+        )
+
+    def test_failed_reshard_keeps_old_shard(self):
+        """Ошибка при копировании убирает копии и снимает запрет."""
+        copy = ReshardCommand.copy
+
+        def fail_on_comments(command, queryset, source, target):
+            copy(command, queryset, source, target)
+            if queryset.model is Comment:
+                raise RuntimeError("copy failed")
+
+        with mock.patch.object(ReshardCommand, "copy", fail_on_comments):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    "reshard_author", "far", "default", stdout=StringIO()
+                )
+
+        self.assertEqual(shard_for_author(self.far.pk), "shard1")
+        self.assertFalse(AuthorShard.objects.get(author=self.far).moving)
+        self.assertFalse(
+            Post.objects.using("default").filter(author=self.far).exists()
+        )
+        self.assertTrue(
+            Post.objects.using("shard1").filter(pk=self.far_post.pk).exists()
+        )
+
+    def test_moving_author_cannot_change_posts(self):
+        """Во время переноса посты автора нельзя менять и комментировать."""
+        move_author(self.far.pk, "shard1", moving=True)
+
+        self.far_post.text = "edited"
+        with self.assertRaises(AuthorMoving):
+            self.far_post.save()
+        with self.assertRaises(AuthorMoving):
+            self.far_post.delete()
+        with self.assertRaises(AuthorMoving):
+            Comment(
+                post=self.far_post, author=self.near, text="new comment"
+            ).save()
+        Post(text="allowed", author=self.near).save()
+
+    def test_writes_ignore_stale_shard_cache(self):
+        """Запись идет в шард из карты, даже если кэш процесса устарел."""
+        cache.set(SHARD_CACHE_KEY.format(self.far.pk), "default")
+        post = Post(text="new", author=self.far)
+        post.save()
+        comment = Comment(post=self.near_post, author=self.far, text="new")
+        comment.save()
+
+        self.assertEqual(post._state.db, "shard1")
+        self.assertEqual(comment._state.db, "default")
+
+    def test_sync_sequences_after_explicit_ids(self):
+        """Записи с явными id сдвигают глобальный счетчик id."""
+        Post.objects.using("shard1").bulk_create(
+            [Post(pk=1000, text="imported", author=self.far)]
+        )
+        sync_sequences(Post)
+        self.assertEqual(next_id(Post), 1001)
+
+    def test_user_delete_cascades_to_all_shards(self):
+        """Удаление пользователя удаляет его записи во всех шардах."""
+        self.far.delete()
+        self.assertFalse(Post.objects.using("shard1").exists())
+        self.assertFalse(Comment.objects.using("shard1").exists())
+
+    def test_commenter_delete_cascades_to_all_shards(self):
+        """Комментарии пользователя к постам в других шардах удаляются."""
+        self.near.delete()
+        self.assertFalse(Comment.objects.using("shard1").exists())
+        self.assertTrue(
+            Post.objects.using("shard1").filter(pk=self.far_post.pk).exists()
+        )
+
+    def test_group_delete_detaches_posts_in_all_shards(self):
+        """Удаление группы обнуляет ее у постов во всех шардах."""
+        self.group.delete()
+        for shard, post in (
+            ("default", self.near_post),
+            ("shard1", self.far_post),
+        ):
+            self.assertIsNone(
+                Post.objects.using(shard).get(pk=post.pk).group_id
+            )
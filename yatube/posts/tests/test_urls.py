@@ -65,10 +65,10 @@ class PostURLTest(TestCase):
         ]
 
     def setUp(self):
+        cache.clear()
         # Авторизация пользователей
         self.authorized_author.force_login(self.author)
         self.authorized_client.force_login(self.user)
-        cache.clear()
 
     def test_urls_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
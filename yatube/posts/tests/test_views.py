@@ -80,9 +80,9 @@ class PostPageTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         # Авторизация пользователя
         self.authorized_client.force_login(self.author)
-        cache.clear()
 
     def post_contex_is_valid_check(self, url):
         """Вызываемая функция проверки передачи данных в context по ключам
@@ -331,10 +331,10 @@ class FollowViewsTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         # Авторизация пользователей
         self.author_client.force_login(self.author)
         self.user_client.force_login(self.user)
-        cache.clear()
 
     def test_authorized_user_follow_author(self):
         """Проверяем что авторизованный пользователь
@@ -29,6 +29,10 @@ urlpatterns = [
     ),
     # Все посты автора, на которого подписан пользователь
     path("follow/", views.follow_index, name="follow_index"),
+    # Число новых постов в ленте подписок с прошлого визита
+    path("follow/new/", views.follow_new_count, name="follow_new_count"),
+    # Подписаться, отписаться или заменить подписки списком
+    path("follow/bulk/", views.follow_bulk, name="follow_bulk"),
     # Подписаться
     path(
         "profile/<str:username>/follow/",
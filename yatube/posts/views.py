@@ -1,15 +1,26 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import router, transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from django.views.decorators.http import require_POST
+
+from .archive import author_posts_with_archive, get_post_with_archive_or_404
+from .feeds import mark_feed_visited, merged_feed_page, new_posts_count
+from .following import bulk_follow, followed_author_ids
+from .forms import BulkFollowForm, CommentForm, PostForm
+from .models import ArchivedPost, Comment, Follow, Group, Post, User
+from .recommendations import suggested_authors
+from .sharding import (followed_posts, get_post_or_404, post_comments,
+                       sharded_posts)
 from .utils import paginate
 
 PAGINATE_BY: int = 10
+SUGGESTIONS_COUNT: int = 5
 
 
 def index(request):
-    posts = Post.objects.select_related("author", "group").all()
+    posts = sharded_posts()
     template = "posts/index.html"
     context = {"page_obj": paginate(request, posts, PAGINATE_BY)}
     return render(request, template, context)
@@ -17,8 +28,7 @@ def index(request):
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    # posts = Post.objects.filter(group=group)
-    posts = Post.objects.select_related("author", "group").filter(group=group)
+    posts = sharded_posts(group=group)
     template = "posts/group_list.html"
     context = {
         "group": group,
@@ -30,35 +40,30 @@ def group_posts(request, slug):
 
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    user_posts = Post.objects.select_related("author", "group").filter(
-        author=author
-    )
-    following = (
-        request.user.is_authenticated
-        and request.user.follower.filter(author=author).exists()
-    )
+    user_posts = author_posts_with_archive(author)
+    following = author.pk in followed_author_ids(request.user)
     template = "posts/profile.html"
     context = {
         "author": author,
         "page_obj": paginate(request, user_posts, PAGINATE_BY),
         "following": following,
+        "suggestions": suggested_authors(request.user, SUGGESTIONS_COUNT),
     }
     return render(request, template, context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    posts_count = Post.objects.filter(
-        author__username=post.author.username
-    ).count()
+    post = get_post_with_archive_or_404(post_id)
+    posts_count = author_posts_with_archive(post.author).count()
     form = CommentForm()
-    comments = post.comments.select_related("author").all()
+    comments = post_comments(post)
     template = "posts/post_detail.html"
     context = {
         "post": post,
         "posts_count": posts_count,
         "form": form,
         "comments": comments,
+        "is_archived": isinstance(post, ArchivedPost),
     }
     return render(request, template, context)
 
@@ -73,7 +78,10 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Пост и событие outbox записываются одной транзакцией.
+        using = router.db_for_write(Post, instance=post)
+        with transaction.atomic(using=using):
+            post.save()
         return redirect("posts:profile", post.author)
 
     template = "posts/create_post.html"
@@ -85,7 +93,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(post_id)
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post
     )
@@ -96,7 +104,9 @@ def post_edit(request, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        using = router.db_for_write(Post, instance=post)
+        with transaction.atomic(using=using):
+            post.save()
         return redirect("posts:post_detail", post_id)
 
     template = "posts/create_post.html"
@@ -109,26 +119,45 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        using = router.db_for_write(Comment, instance=comment)
+        with transaction.atomic(using=using):
+            comment.save()
     return redirect("posts:post_detail", post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    user_posts = Post.objects.filter(author__following__user=request.user)
     template = "posts/follow.html"
+    reader = request.GET.get("reader", settings.FEED_READER)
+    if reader == "merge":
+        page_obj = merged_feed_page(
+            request.user, request.GET.get("cursor"), PAGINATE_BY
+        )
+    else:
+        user_posts = followed_posts(request.user)
+        page_obj = paginate(request, user_posts, PAGINATE_BY)
+    if "page" not in request.GET and "cursor" not in request.GET:
+        mark_feed_visited(request.user)
     context = {
-        "page_obj": paginate(request, user_posts, PAGINATE_BY),
+        "page_obj": page_obj,
+        "reader": reader,
     }
     return render(request, template, context)
 
 
+@login_required
+def follow_new_count(request):
+    # Число новых постов в ленте подписок с прошлого визита
+    count, visited = new_posts_count(request.user)
+    return JsonResponse({"count": count, "since": visited})
+
+
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
@@ -145,13 +174,32 @@ def profile_unfollow(request, username):
     return redirect("posts:profile", username=username)
 
 
+@require_POST
+@login_required
+def follow_bulk(request):
+    # Подписаться, отписаться или заменить подписки списком авторов
+    data = request.POST.copy()
+    data["usernames"] = " ".join(request.POST.getlist("usernames"))
+    form = BulkFollowForm(data)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    result = bulk_follow(
+        request.user,
+        form.cleaned_data["usernames"],
+        form.cleaned_data["mode"],
+    )
+    return JsonResponse(result)
+
+
 @login_required
 def delete_message(request, post_id):
-    message = get_object_or_404(Post, pk=post_id, author=request.user)
+    message = get_post_or_404(post_id, author=request.user)
     template = "delete_message.html"
 
     if request.method == "POST":
-        message.delete()
+        using = router.db_for_write(Post, instance=message)
+        with transaction.atomic(using=using):
+            message.delete()
         return redirect("posts:index")
 
     return render(request, template)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = "users"
+
+    def ready(self):
+        # Регистрируем обработчики сигналов и проверки.
+        from . import auth, checks  # noqa: F401
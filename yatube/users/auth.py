@@ -0,0 +1,81 @@
+"""Пользователь запроса из кэша вместо запроса к базе.
+
+Объект пользователя хранится в кэше AUTH_USER_CACHE под ключом
+auth_user:{id} на AUTH_USER_CACHE_TIMEOUT секунд. Как и в
+django.contrib.auth.get_user, хеш пароля в сессии сверяется с хешем
+пользователя, поэтому смена пароля (PasswordChangeView сохраняет
+пользователя и сбрасывает его кэш) завершает остальные сессии. Выход
+(LogoutView) удаляет сессию и кэш пользователя. Запрос без cookie
+сессии сразу получает AnonymousUser и не трогает сессию вовсе.
+
+Сброс кэша виден другим процессам, только если кэш общий (memcached),
+поэтому без AUTH_USER_CACHE пользователь читается из базы, а кэш
+в памяти процесса для него запрещен проверкой users.E002.
+"""
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+
+User = get_user_model()
+
+USER_CACHE_KEY = "auth_user:{}"
+
+
+def user_cache():
+    alias = settings.AUTH_USER_CACHE
+    return caches[alias] if alias else None
+
+
+def get_cached_user(request):
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return AnonymousUser()
+    try:
+        user_id = User._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    cache = user_cache()
+    key = USER_CACHE_KEY.format(user_id)
+    user = cache.get(key) if cache is not None else None
+    if user is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        if cache is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        request.session.flush()
+        return AnonymousUser()
+    user.backend = backend_path
+    return user
+
+
+def invalidate_user(user_id):
+    cache = user_cache()
+    if cache is not None:
+        cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_handler(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -0,0 +1,44 @@
+"""Проверки кэша для сессий и пользователя запроса (users.auth).
+
+Выход и смена пароля сбрасывают кэш только в своем процессе: с кэшем
+в памяти процесса (LocMemCache) другие воркеры продолжали бы принимать
+завершенные сессии до истечения их записей.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from core.cache import is_process_local
+
+CACHED_SESSION_ENGINES = (
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES and is_process_local(
+        settings.SESSION_CACHE_ALIAS
+    ):
+        errors.append(
+            Error(
+                "Сессии хранятся в кэше памяти процесса.",
+                hint=(
+                    "Укажите общий кэш (YATUBE_MEMCACHED) или "
+                    "SESSION_ENGINE = 'django.contrib.sessions.backends.db'."
+                ),
+                id="users.E001",
+            )
+        )
+    if settings.AUTH_USER_CACHE and is_process_local(
+        settings.AUTH_USER_CACHE
+    ):
+        errors.append(
+            Error(
+                "AUTH_USER_CACHE указывает на кэш памяти процесса.",
+                hint="Укажите общий кэш или AUTH_USER_CACHE = None.",
+                id="users.E002",
+            )
+        )
+    return errors
@@ -48,11 +48,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.QueryTimingMiddleware",
+    "core.middleware.TemplateProfilerMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.CachedAuthenticationMiddleware",
+    "core.middleware.RateLimitMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -91,6 +98,59 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: alias -> {"weight": ..., "max_lag": ...}.
+# Для локальной проверки достаточно перечислить файлы SQLite
+# через запятую в переменной окружения YATUBE_DB_REPLICAS.
+DATABASE_REPLICAS = {}
+
+for number, path in enumerate(
+    filter(None, os.getenv("YATUBE_DB_REPLICAS", "").split(",")), start=1
+):
+    DATABASES[f"replica{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS[f"replica{number}"] = {"weight": 1}
+
+# Базы, между которыми по авторам распределяются посты и комментарии.
+# Дополнительные шарды на SQLite перечисляются через запятую
+# в переменной окружения YATUBE_DB_SHARDS.
+POST_SHARDS = ["default"]
+
+for number, path in enumerate(
+    filter(None, os.getenv("YATUBE_DB_SHARDS", "").split(",")), start=1
+):
+    DATABASES[f"shard{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+    }
+    POST_SHARDS.append(f"shard{number}")
+
+# Сколько секунд процесс помнит шард автора; столько же reshard_author
+# ждет после переключения карты, прежде чем удалить записи из старого
+# шарда, чтобы другие процессы успели перечитать карту.
+SHARD_CACHE_TIMEOUT = 60
+
+DATABASE_ROUTERS = [
+    "posts.sharding.PostShardRouter",
+    "core.db_router.ReplicaRouter",
+]
+
+# Модель, по свежести записей которой оценивается отставание реплик.
+REPLICA_LAG_MODEL = "posts.Post"
+
+# Максимально допустимое отставание реплики, секунд.
+REPLICA_MAX_LAG = 5
+
+# Как часто перепроверять исправность и отставание реплик, секунд.
+REPLICA_CHECK_INTERVAL = 10
+
+# Сколько секунд после записи читать только из основной базы.
+REPLICA_PIN_SECONDS = 10
+
+REPLICA_PIN_COOKIE_NAME = "pin_primary"
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -129,12 +189,44 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 
 STATIC_URL = "/static/"
 
+# Сюда collectstatic складывает статику с хешами в именах и сжатыми
+# копиями; StaticFilesMiddleware раздает ее с вечным кэшем.
+STATIC_ROOT = os.path.join(BASE_DIR, "static_root")
+
+STATICFILES_STORAGE = (
+    "django.contrib.staticfiles.storage.StaticFilesStorage"
+    if DEBUG
+    else "core.staticfiles.CompressedManifestStaticFilesStorage"
+)
+
+# Время кэширования в секундах: файлы с хешем в имени не меняются,
+# остальные (например, favicon.ico по старому адресу) — могут.
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+STATIC_MAX_AGE = 60 * 60
+
+# Ответы короче порога (в байтах) не сжимаются.
+COMPRESSION_MIN_SIZE = 200
+
+# Наибольшая длина случайного дополнения gzip для страниц
+# с CSRF-токеном: шум против BREACH, а не защита (см. core.compression).
+COMPRESSION_BREACH_PADDING = 100
+
 LOGIN_URL = "users:login"
 
 LOGIN_REDIRECT_URL = "posts:index"
 
+# Письма ставятся в очередь (core.mail) и отправляются командой
+# process_outbox через QUEUED_EMAIL_BACKEND.
+EMAIL_BACKEND = "core.mail.QueuedEmailBackend"
+
 #  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+QUEUED_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+
+# Одинаковые письма за это время (в секундах) отправляются один раз.
+MAIL_DEDUP_SECONDS = 60 * 60
+
+MAIL_MAX_ATTEMPTS = 5
 
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
@@ -147,8 +239,148 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Общий кэш всех процессов: адрес memcached («host:port», нужен пакет
+# python-memcached). Без него у каждого процесса свой кэш в памяти.
+MEMCACHED_LOCATION = os.getenv("YATUBE_MEMCACHED")
+
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedMemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedLocMemCache',
+        }
     }
+
+# Множество подписок пользователя (posts.following) кэшируется только
+# в общем кэше: подписка сбрасывает кэш лишь в своем процессе
+# (проверка posts.E001). Без него множество читается раз за запрос.
+FOLLOWING_CACHE = "default" if MEMCACHED_LOCATION else None
+
+# Сколько секунд хранить в кэше множество подписок пользователя.
+FOLLOWING_CACHE_TIMEOUT = 60 * 60
+
+# Сессии и пользователь запроса (users.auth) кэшируются, только если кэш
+# общий: выход и смена пароля сбрасывают кэш лишь в своем процессе,
+# и с кэшем в памяти остальные воркеры принимали бы завершенные сессии.
+# Проверка users.E001/E002 не дает включить их с локальным кэшем.
+if MEMCACHED_LOCATION:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    AUTH_USER_CACHE = "default"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    AUTH_USER_CACHE = None
+
+# Сколько секунд пользователь сессии хранится в кэше (users.auth).
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
+# Сколько авторов можно передать в follow/bulk/ за один запрос.
+BULK_FOLLOW_LIMIT = 1000
+
+# Как читать ленту подписок по умолчанию: "join" — одним запросом,
+# "merge" — слиянием лент авторов (posts.feeds). Переопределяется
+# параметром ?reader= в запросе.
+FEED_READER = "join"
+# Сколько постов автора читать за раз при слиянии лент.
+FEED_MERGE_WINDOW = 5
+# Сколько последних постов автора помнить в кэше для счетчика новых
+# постов ленты; больше этого числа от одного автора не насчитывается.
+FEED_RECENT_POSTS = 50
+# Сколько секунд хранить в кэше время последних постов автора.
+FEED_RECENT_POSTS_TIMEOUT = 60
+
+# Transactional outbox (core.outbox): сколько раз повторять обработку
+# события и предельная задержка между попытками в секундах.
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_MAX_RETRY_DELAY = 60 * 60
+
+# Лимиты частоты запросов по маршрутам (core.ratelimit): «N/период»,
+# где период — s, m, h или d; отдельно на пользователя и на IP.
+# Корзины хранятся в общем кэше: с кэшем в памяти процесса каждый
+# воркер считал бы свою, поэтому без него лимиты не применяются
+# (проверки core.E001 и core.W001).
+RATELIMIT_CACHE = "default" if MEMCACHED_LOCATION else None
+RATELIMITS = {
+    "posts:post_create": {"user": "10/m", "ip": "30/m"},
+    "posts:post_edit": {"user": "20/m", "ip": "60/m"},
+    "posts:add_comment": {"user": "20/m", "ip": "60/m"},
+    "posts:delete_message": {"user": "20/m", "ip": "60/m"},
+    "posts:follow_bulk": {"user": "10/m", "ip": "30/m"},
+    "posts:profile_follow": {
+        "user": "30/m",
+        "ip": "100/m",
+        "methods": ("GET",),
+    },
+    "posts:profile_unfollow": {
+        "user": "30/m",
+        "ip": "100/m",
+        "methods": ("GET",),
+    },
+    "users:signup": {"ip": "5/h"},
+}
+
+# Списки админки (core.paginator): до какого числа записей считать
+# точно и сколько секунд хранить в кэше точное число для больших списков.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_COUNT_CACHE_TIMEOUT = 5 * 60
+
+# Посты старше стольких дней переносятся в архив командой archive_posts.
+ARCHIVE_AFTER_DAYS = 365
+
+# Запросы к базе дольше порога попадают в лог core.slow_sql,
+# но только для заданной доли запросов к сайту.
+SLOW_QUERY_THRESHOLD_MS = 100
+
+SLOW_QUERY_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.slow_sql": {"handlers": ["console"], "level": "WARNING"},
+        "core.template_profiler": {"handlers": ["console"], "level": "INFO"},
+        "core.outbox": {"handlers": ["console"], "level": "WARNING"},
+        "core.mail": {"handlers": ["console"], "level": "WARNING"},
+        "core.warmup": {"handlers": ["console"], "level": "INFO"},
+    },
 }
+
+# Каталог, куда воркеры сохраняют снимки метрик для /metrics/;
+# None — показывать метрики только текущего процесса.
+METRICS_DIR = os.getenv("YATUBE_METRICS_DIR")
+
+METRICS_FLUSH_INTERVAL = 5
+
+# Доступ к /metrics/: с токеном — только с заголовком
+# «Authorization: Bearer <токен>», без него — с адресов METRICS_ALLOWED_IPS.
+# За обратным прокси на той же машине все клиенты приходят с 127.0.0.1,
+# поэтому там токен обязателен.
+METRICS_TOKEN = os.getenv("YATUBE_METRICS_TOKEN")
+
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+# Профилирование рендеринга шаблонов (включается для отладки).
+TEMPLATE_PROFILING = os.getenv("YATUBE_TEMPLATE_PROFILING") == "1"
+
+# Каталог для отчетов и стеков flamegraph; None — только лог.
+TEMPLATE_PROFILER_DIR = os.getenv("YATUBE_TEMPLATE_PROFILER_DIR")
+
+# Сколько самых дорогих элементов выводить в лог.
+TEMPLATE_PROFILER_TOP = 20
+
+# Прогрев воркера при запуске через wsgi.py (см. core.warmup).
+WARMUP_ON_START = os.getenv("YATUBE_WARMUP") == "1"
+
+# Сколько самых активных групп рендерить при прогреве
+# и за сколько дней считать их посты.
+WARMUP_HOT_GROUPS = 5
+
+WARMUP_HOT_DAYS = 7
@@ -0,0 +1,15 @@
+"""Настройки тестов: manage.py test и pytest (pytest.ini).
+
+Второй шард создается и без YATUBE_DB_SHARDS: тесты шардирования
+включают его в POST_SHARDS через override_settings.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+if "shard1" not in DATABASES:
+    DATABASES["shard1"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "shard1.sqlite3"),
+    }
@@ -7,10 +7,21 @@ For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
 
 application = get_wsgi_application()
+
+if settings.WARMUP_ON_START:
+    from core.warmup import warm_up
+
+    try:
+        warm_up()
+    except Exception:
+        # Неудачный прогрев не должен мешать воркеру принимать запросы.
+        logging.getLogger("core.warmup").exception("Прогрев не удался")